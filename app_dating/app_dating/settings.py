@@ -13,6 +13,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 from pathlib import Path
 import os
 # noinspection PyUnresolvedReferences
+from django.core.exceptions import ImproperlyConfigured
+# noinspection PyUnresolvedReferences
 from dotenv import load_dotenv
 import psycopg2
 
@@ -21,17 +23,25 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 
 load_dotenv(os.path.join(BASE_DIR, 'db.env'))
 
+# Профиль настроек: development (по умолчанию) или production.
+# Выбирается переменной окружения DJANGO_ENV
+DJANGO_ENV = os.getenv('DJANGO_ENV', 'development')
+PRODUCTION = DJANGO_ENV == 'production'
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-SECRET_KEY = "django-insecure-zd5z-sg(ia8+z*7z6yci8whvp^&1slspax)4j2cg#u)3yj4i#m"
+SECRET_KEY = os.getenv(
+    'DJANGO_SECRET_KEY',
+    "django-insecure-zd5z-sg(ia8+z*7z6yci8whvp^&1slspax)4j2cg#u)3yj4i#m"
+)
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = not PRODUCTION
 
-ALLOWED_HOSTS = []
+ALLOWED_HOSTS = [host for host in os.getenv('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
 
 
 # Application definition
@@ -43,22 +53,30 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    "debug_toolbar",
+    "django.contrib.postgres",
 
     'dating',
 ]
 
 MIDDLEWARE = [
+    # Первым, чтобы время ответа включало остальные middleware
+    "dating.middleware.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
+    # После сессий (метка "прилипания" к основной БД) и до аутентификации
+    "dating.routers.ReplicaRoutingMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    "debug_toolbar.middleware.DebugToolbarMiddleware",
 ]
 
+# debug_toolbar только для разработки
+if DEBUG:
+    INSTALLED_APPS.append("debug_toolbar")
+    MIDDLEWARE.append("debug_toolbar.middleware.DebugToolbarMiddleware")
+
 ROOT_URLCONF = "app_dating.urls"
 
 TEMPLATES = [
@@ -71,6 +89,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "dating.context_processors.notifications",
             ],
         },
     },
@@ -97,6 +116,21 @@ DATABASES = {
     }
 }
 
+# Реплики только для чтения: DB_REPLICA_HOSTS=host1,host2 создает алиасы
+# replica1, replica2 с теми же параметрами, что и default (см. dating.routers)
+DATABASE_REPLICAS = []
+for _index, _host in enumerate(filter(None, os.getenv('DB_REPLICA_HOSTS', '').split(',')), start=1):
+    DATABASES[f'replica{_index}'] = {
+        **DATABASES['default'],
+        'HOST': _host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(f'replica{_index}')
+
+DATABASE_ROUTERS = ['dating.routers.ReplicaRouter']
+# Сколько секунд после записи сессия читает с основной БД
+REPLICA_STICKY_SECONDS = 10
+
 AUTH_USER_MODEL = 'dating.User'
 
 # Password validation
@@ -149,3 +183,78 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 LOGIN_REDIRECT_URL = 'home'  # После входа -> на главную
 LOGOUT_REDIRECT_URL = 'home'  # После выхода -> на главную
 LOGIN_URL = 'login'  # URL для входа
+
+# Брокер уведомлений о лайках и мэтчах (SSE). Брокер в памяти работает в рамках
+# одного процесса; для нескольких воркеров нужен класс с тем же интерфейсом
+# (subscribe/unsubscribe/publish) поверх внешнего брокера
+NOTIFICATIONS_BROKER = 'dating.notifications.InProcessBroker'
+# Поток SSE бесконечный: под WSGI он навсегда занимает поток воркера, поэтому
+# страницы подключаются к нему, только когда приложение запущено через asgi.py
+NOTIFICATIONS_STREAM = os.getenv('DJANGO_ASGI') == '1'
+
+# Метрики (/metrics) и журнал медленных SQL-запросов (логгер dating.slow_queries).
+# Пустой список METRICS_ALLOWED_IPS открывает /metrics для всех адресов
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+METRICS_SLOW_QUERY_MS = 200
+# Доля медленных запросов, попадающих в журнал (счетчик учитывает все)
+METRICS_SLOW_QUERY_SAMPLE_RATE = 0.1
+
+# Срок хранения журнала просмотров анкет (см. команду manage_view_partitions)
+PROFILE_VIEW_RETENTION_DAYS = 90
+# Просмотры копятся в памяти процесса и пишутся в БД пачкой: при заполнении
+# буфера или когда самому старому просмотру исполнится столько секунд
+PROFILE_VIEW_BUFFER_SIZE = 500
+PROFILE_VIEW_FLUSH_SECONDS = 30
+
+
+# Production: постоянные соединения с БД, кэш шаблонов, сессии без записи в БД.
+# debug_toolbar в production не подключается, так как DEBUG выключен
+if PRODUCTION:
+    if 'DJANGO_SECRET_KEY' not in os.environ:
+        raise ImproperlyConfigured('В production нужно задать DJANGO_SECRET_KEY')
+
+    if os.getenv('DB_POOL'):
+        # Пул соединений psycopg 3 (Django 5.1+); с пулом CONN_MAX_AGE должен быть 0
+        # noinspection PyUnresolvedReferences
+        from psycopg import IsolationLevel
+
+        for database in DATABASES.values():
+            database['OPTIONS'] = {
+                'isolation_level': IsolationLevel.READ_COMMITTED,
+                'pool': {
+                    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+                    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+                    'timeout': 10,
+                },
+            }
+    else:
+        # Соединение переиспользуется между запросами; перед повторным
+        # использованием Django проверяет, что оно живо
+        for database in DATABASES.values():
+            database['CONN_MAX_AGE'] = int(os.getenv('DB_CONN_MAX_AGE', 600))
+            database['CONN_HEALTH_CHECKS'] = True
+
+    # Шаблоны компилируются один раз на процесс
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
+    if os.getenv('REDIS_URL'):
+        # Общий для всех воркеров кэш: сессии, фильтры, карточки профилей
+        CACHES = {
+            'default': {
+                'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+                'LOCATION': os.getenv('REDIS_URL'),
+            }
+        }
+        SESSION_ENGINE = 'django.contrib.sessions.backends.cache'
+    else:
+        # Без общего кэша сессия хранится в подписанной cookie
+        SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+    SESSION_COOKIE_SECURE = True
+    CSRF_COOKIE_SECURE = True
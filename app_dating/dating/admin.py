@@ -4,7 +4,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 # noinspection PyUnresolvedReferences
 from django.utils.html import format_html
-from .models import User, UserPhoto, UserInteraction, Match, ContactExchange
+from .models import City, User, UserPhoto, UserInteraction, Match, ContactExchange
 
 
 @admin.register(User)
@@ -14,7 +14,7 @@ class CustomUserAdmin(UserAdmin):
     list_filter = ('gender', 'status', 'is_private', 'is_active', 'city', 'created_at')
     search_fields = ('email', 'first_name', 'last_name', 'city')
     ordering = ('-created_at',)
-    readonly_fields = ('created_at', 'updated_at', 'likes_count')
+    readonly_fields = ('created_at', 'updated_at', 'likes_count', 'views_count')
 
     fieldsets = (
         (None, {
@@ -24,7 +24,7 @@ class CustomUserAdmin(UserAdmin):
             'fields': ('first_name', 'last_name', 'gender', 'age', 'city', 'hobbies')
         }),
         ('Статус и настройки', {
-            'fields': ('status', 'likes_count', 'is_private')
+            'fields': ('status', 'likes_count', 'views_count', 'is_private')
         }),
         ('Разрешения', {
             'fields': ('is_active', 'is_staff', 'is_superuser',
@@ -56,7 +56,7 @@ class UserPhotoInline(admin.TabularInline):
 
     def preview_photo(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" height="100" />', obj.photo.url)
+            return format_html('<img src="{}" height="100" />', obj.thumbnail_url)
         return "Нет фото"
 
     preview_photo.short_description = 'Предпросмотр'
@@ -64,8 +64,8 @@ class UserPhotoInline(admin.TabularInline):
 
 @admin.register(UserPhoto)
 class UserPhotoAdmin(admin.ModelAdmin):
-    list_display = ('user_email', 'preview_photo', 'is_main', 'uploaded_at')
-    list_filter = ('is_main', 'uploaded_at')
+    list_display = ('user_email', 'preview_photo', 'is_main', 'processing_state', 'uploaded_at')
+    list_filter = ('is_main', 'processing_state', 'uploaded_at')
     search_fields = ('user__email', 'user__first_name', 'user__last_name')
     readonly_fields = ('uploaded_at', 'preview_photo')
     list_editable = ('is_main',)
@@ -78,7 +78,7 @@ class UserPhotoAdmin(admin.ModelAdmin):
 
     def preview_photo(self, obj):
         if obj.photo:
-            return format_html('<img src="{}" height="50" />', obj.photo.url)
+            return format_html('<img src="{}" height="50" />', obj.thumbnail_url)
         return "Нет фото"
 
     preview_photo.short_description = 'Фото'
@@ -104,6 +104,14 @@ class UserInteractionAdmin(admin.ModelAdmin):
     to_user_email.admin_order_field = 'to_user__email'
 
 
+@admin.register(City)
+class CityAdmin(admin.ModelAdmin):
+    # Города, созданные из анкет, попадают сюда без координат - их можно дописать
+    list_display = ('name', 'latitude', 'longitude', 'geohash')
+    search_fields = ('name',)
+    readonly_fields = ('geohash',)
+
+
 class ContactExchangeInline(admin.TabularInline):
     model = ContactExchange
     extra = 0
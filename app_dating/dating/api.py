@@ -0,0 +1,138 @@
+import json
+from functools import wraps
+
+# noinspection PyUnresolvedReferences
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+# noinspection PyUnresolvedReferences
+from django.core.handlers.asgi import ASGIRequest
+# noinspection PyUnresolvedReferences
+from django.http import JsonResponse, StreamingHttpResponse
+# noinspection PyUnresolvedReferences
+from django.views.decorators.http import require_GET, require_POST
+from .interactions import SWIPE_TYPES, record_swipes
+from .models import User
+from .notifications import event_stream
+from .queues import candidate_ids
+
+# Ограничения одного запроса
+FEED_LIMIT = 50
+MAX_SWIPES_PER_REQUEST = 100
+
+
+def api_login_required(view):
+    """Как login_required, но вместо редиректа на страницу входа отвечает 401"""
+    def unauthorized():
+        return JsonResponse({'error': 'Требуется авторизация'}, status=401)
+
+    if iscoroutinefunction(view):
+        @wraps(view)
+        async def wrapper(request, *args, **kwargs):
+            user = await request.auser()
+            if not user.is_authenticated:
+                return unauthorized()
+            return await view(request, *args, **kwargs)
+
+        return markcoroutinefunction(wrapper)
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return unauthorized()
+        return view(request, *args, **kwargs)
+
+    return wrapper
+
+
+def serialize_user(user):
+    photo = user.main_photo
+    return {
+        'id': user.id,
+        'first_name': user.first_name,
+        'age': user.age,
+        'city': user.city,
+        'gender': user.gender,
+        'status': user.status,
+        'hobbies': user.hobbies,
+        'likes_count': user.likes_count,
+        'photo': {
+            'url': photo.card_url,
+            'srcset': photo.srcset,
+        } if photo else None,
+    }
+
+
+@require_GET
+@api_login_required
+async def feed(request):
+    """Следующие рекомендованные анкеты; оцененные пропадают из выдачи сами"""
+    try:
+        limit = min(int(request.GET.get('limit', 20)), FEED_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'limit должен быть числом'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'limit должен быть положительным'}, status=400)
+
+    viewer = await request.auser()
+    ids = await sync_to_async(candidate_ids)(viewer, limit=limit)
+    users = await User.objects.filter(is_active=True).select_related('main_photo').ain_bulk(ids)
+    return JsonResponse({
+        'results': [serialize_user(users[pk]) for pk in ids if pk in users],
+    })
+
+
+@require_POST
+@api_login_required
+async def interactions(request):
+    """
+    Пачка свайпов одним запросом.
+
+    Тело: {"swipes": [{"user_id": 5, "action": "like"}, ...]}. Если один и тот же
+    пользователь встречается несколько раз, действует последний свайп.
+    """
+    try:
+        payload = json.loads(request.body)
+        swipes = {}
+        for swipe in payload['swipes']:
+            action = swipe['action']
+            if action not in SWIPE_TYPES:
+                raise ValueError(f'Неизвестное действие: {action}')
+            swipes[int(swipe['user_id'])] = action
+    except (ValueError, KeyError, TypeError) as exc:
+        return JsonResponse({'error': f'Некорректный запрос: {exc}'}, status=400)
+
+    if len(swipes) > MAX_SWIPES_PER_REQUEST:
+        return JsonResponse(
+            {'error': f'Не больше {MAX_SWIPES_PER_REQUEST} свайпов за запрос'},
+            status=400
+        )
+
+    viewer = await request.auser()
+    swipes.pop(viewer.pk, None)
+    existing = {
+        pk async for pk in User.objects.filter(pk__in=swipes).values_list('pk', flat=True)
+    }
+    unknown = sorted(set(swipes) - existing)
+    swipes = {pk: action for pk, action in swipes.items() if pk in existing}
+
+    # Транзакции в async ORM недоступны, поэтому запись идет в потоке
+    saved, matches = await sync_to_async(record_swipes)(viewer, swipes)
+    return JsonResponse({
+        'saved': saved,
+        'matches': matches,
+        'unknown_users': unknown,
+    })
+
+
+@require_GET
+@api_login_required
+async def notifications(request):
+    """Server-Sent Events: лайки и мэтчи в реальном времени (нужен ASGI-сервер)"""
+    if not isinstance(request, ASGIRequest):
+        # Под WSGI бесконечный поток дочитывается целиком и не отпускает воркер
+        return JsonResponse({'error': 'Уведомления доступны только при запуске через ASGI'}, status=501)
+    viewer = await request.auser()
+    response = StreamingHttpResponse(event_stream(viewer.pk), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Запрещаем буферизацию потока в nginx
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class DatingConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "dating"
+
+    def ready(self):
+        # Подключаем обработчики сигналов
+        from . import signals  # noqa: F401
+        # Подсчет SQL-запросов для метрик (см. dating.metrics)
+        from django.db.backends.signals import connection_created
+        from .metrics import install_query_timer
+        connection_created.connect(install_query_timer, dispatch_uid='dating_query_timer')
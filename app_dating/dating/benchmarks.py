@@ -0,0 +1,145 @@
+import json
+import shutil
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+from django.core.files.uploadedfile import SimpleUploadedFile
+# noinspection PyUnresolvedReferences
+from django.db import connection, transaction
+# noinspection PyUnresolvedReferences
+from django.test import Client, override_settings
+# noinspection PyUnresolvedReferences
+from django.test.utils import CaptureQueriesContext
+# noinspection PyUnresolvedReferences
+from django.urls import reverse
+# noinspection PyUnresolvedReferences
+from PIL import Image
+from .models import User
+from .view_tracking import suspend_tracking
+
+# Допустимый рост задержек и времени SQL относительно базовой линии
+DEFAULT_TOLERANCE = 0.25
+# Абсолютный запас, чтобы шум на единицах миллисекунд не считался регрессией
+MIN_SLACK_MS = 1.0
+METRICS = ['p50_ms', 'p99_ms', 'queries', 'sql_ms']
+
+
+def make_upload():
+    buffer = BytesIO()
+    Image.new('RGB', (1200, 900), (120, 140, 160)).save(buffer, 'JPEG', quality=85)
+    return SimpleUploadedFile('bench.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+def build_scenarios(targets):
+    """
+    Сценарии замера: имя -> функция (client, номер итерации) -> response.
+    Цели перебираются по кругу, чтобы не мерить только попадания в кэш.
+    """
+    def target(i):
+        return targets[i % len(targets)]
+
+    return {
+        'home': lambda client, i: client.get(reverse('home')),
+        'home_filtered': lambda client, i: client.get(reverse('home'), {'gender': 'F', 'age_min': 25}),
+        'user_detail': lambda client, i: client.get(reverse('user_detail', args=[target(i)])),
+        'interact_user': lambda client, i: client.get(
+            reverse('interact_user', args=['like' if i % 2 else 'dislike', target(i)])
+        ),
+        'upload_photo': lambda client, i: client.post(reverse('upload_photo'), {'photo': make_upload()}),
+    }
+
+
+def measure(client, scenario, iterations, warmup):
+    """
+    Выполняет сценарий и возвращает p50/p99 задержки, число запросов к БД
+    (максимум по итерациям) и медианное время SQL. Каждый запрос идет в
+    транзакции с откатом, так что набор данных не меняется между запусками.
+    Учет просмотров выключен: буфер просмотров пишется вне этой транзакции.
+    """
+    latencies, queries, sql_times = [], [], []
+    for i in range(warmup + iterations):
+        with suspend_tracking(), transaction.atomic():
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = scenario(client, i)
+                elapsed = time.perf_counter() - started
+            transaction.set_rollback(True)
+
+        if response.status_code >= 400:
+            raise RuntimeError(f'Сценарий вернул {response.status_code}')
+        if i < warmup:
+            continue
+        latencies.append(elapsed * 1000)
+        queries.append(len(captured))
+        sql_times.append(sum(float(query['time']) for query in captured.captured_queries) * 1000)
+
+    return {
+        'p50_ms': round(float(np.percentile(latencies, 50)), 2),
+        'p99_ms': round(float(np.percentile(latencies, 99)), 2),
+        'queries': max(queries),
+        'sql_ms': round(float(np.median(sql_times)), 2),
+    }
+
+
+def run_benchmarks(viewer, targets, iterations=50, warmup=5, only=None):
+    """Прогоняет горячие представления от имени viewer; возвращает метрики по сценариям"""
+    client = Client()
+    client.force_login(viewer)
+    scenarios = build_scenarios(targets)
+
+    media_root = tempfile.mkdtemp()
+    try:
+        # Загруженные при замере файлы не попадают в настоящий MEDIA_ROOT
+        with override_settings(MEDIA_ROOT=media_root):
+            return {
+                name: measure(client, scenario, iterations, warmup)
+                for name, scenario in scenarios.items()
+                if not only or name in only
+            }
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+
+
+def default_subjects(target_count=20):
+    """Зритель и цели для замера: первые активные пользователи по id"""
+    ids = list(User.objects.filter(is_active=True).order_by('id').values_list('id', flat=True)[:target_count + 1])
+    if len(ids) < 2:
+        raise RuntimeError('Нужно минимум два активных пользователя (см. команду seed_dating)')
+    return User.objects.get(pk=ids[0]), ids[1:]
+
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """
+    Сравнивает результаты с базовой линией и возвращает список регрессий.
+    Число запросов - жесткий бюджет, время - с допуском tolerance.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        expected = baseline.get(name)
+        if not expected:
+            continue
+        if metrics['queries'] > expected['queries']:
+            regressions.append(f"{name}: запросов {metrics['queries']} > {expected['queries']}")
+        for metric in ('p50_ms', 'p99_ms', 'sql_ms'):
+            limit = max(expected[metric] * (1 + tolerance), expected[metric] + MIN_SLACK_MS)
+            if metrics[metric] > limit:
+                regressions.append(f"{name}: {metric} {metrics[metric]} > {limit:.2f}")
+    return regressions
+
+
+def load_baseline(path):
+    try:
+        with open(path, encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=2, sort_keys=True)
+        file.write('\n')
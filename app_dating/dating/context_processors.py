@@ -0,0 +1,7 @@
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+
+
+def notifications(request):
+    """Подключать ли страницы к потоку уведомлений (см. NOTIFICATIONS_STREAM)"""
+    return {'notifications_stream': getattr(settings, 'NOTIFICATIONS_STREAM', False)}
@@ -0,0 +1,59 @@
+# noinspection PyUnresolvedReferences
+from asgiref.sync import sync_to_async
+# noinspection PyUnresolvedReferences
+from django.core.cache import cache
+# noinspection PyUnresolvedReferences
+from django.db.models import Count
+from .metrics import record_cache
+
+FACETS_CACHE_KEY = 'dating:facets'
+FACETS_CACHE_TIMEOUT = 60 * 15
+
+# Поля, при изменении которых нужно пересчитать фильтры главной страницы
+FACET_FIELDS = ('city', 'is_active', 'gender', 'status')
+
+
+def build_facets():
+    """Один проход по активным пользователям: список городов и счетчики по полу и статусу"""
+    from .models import User
+
+    cities = set()
+    genders = {}
+    statuses = {}
+    rows = User.objects.filter(is_active=True).values('city', 'gender', 'status').annotate(
+        total=Count('id')
+    ).order_by()
+    for row in rows:
+        cities.add(row['city'])
+        genders[row['gender']] = genders.get(row['gender'], 0) + row['total']
+        statuses[row['status']] = statuses.get(row['status'], 0) + row['total']
+
+    return {
+        'cities': sorted(cities),
+        'genders': genders,
+        'statuses': statuses,
+    }
+
+
+def get_facets():
+    """Фильтры для главной страницы из кэша; запрос к БД только при промахе"""
+    facets = cache.get(FACETS_CACHE_KEY)
+    record_cache('facets', facets is not None)
+    if facets is None:
+        facets = build_facets()
+        cache.set(FACETS_CACHE_KEY, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+async def aget_facets():
+    """Асинхронная версия get_facets"""
+    facets = await cache.aget(FACETS_CACHE_KEY)
+    record_cache('facets', facets is not None)
+    if facets is None:
+        facets = await sync_to_async(build_facets)()
+        await cache.aset(FACETS_CACHE_KEY, facets, FACETS_CACHE_TIMEOUT)
+    return facets
+
+
+def invalidate_facets():
+    cache.delete(FACETS_CACHE_KEY)
@@ -0,0 +1,112 @@
+"""
+Геопоиск без PostGIS: города хранятся с координатами и geohash, поиск в
+радиусе - это несколько префиксных запросов по B-tree индексу geohash
+и точная проверка расстояния для найденных городов.
+"""
+import math
+import re
+
+# noinspection PyUnresolvedReferences
+from django.db.models import Q
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 9
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.32
+
+
+def normalize_city_name(name):
+    """Ключ города: регистр, лишние пробелы и 'ё' не различаются"""
+    return re.sub(r'\s+', ' ', (name or '').strip()).lower().replace('ё', 'е')
+
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    longitude = (longitude + 180.0) % 360.0 - 180.0
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Биты долготы и широты чередуются, начиная с долготы
+        bounds, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (bounds[0] + bounds[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            bounds[0] = middle
+        else:
+            bounds[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """Размер ячейки geohash в градусах: (широта, долгота)"""
+    bits = precision * 5
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """
+    Префиксы geohash, покрывающие круг радиусом radius_km. Точность подбирается
+    так, чтобы ячейка была не меньше радиуса: получается не больше 3x3 ячеек.
+    """
+    # Больше половины окружности по долготе не бывает: без ограничения
+    # число шагов цикла ниже росло бы вместе с радиусом
+    lat_delta = min(radius_km / KM_PER_DEGREE, 180.0)
+    lon_delta = min(radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01)), 180.0)
+
+    precision = 1
+    while precision < GEOHASH_PRECISION:
+        height, width = cell_size(precision + 1)
+        if height < lat_delta or width < lon_delta:
+            break
+        precision += 1
+    height, width = cell_size(precision)
+
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    west, east = longitude - lon_delta, longitude + lon_delta
+
+    # Шаг выборки равен размеру ячейки, поэтому ни одна ячейка не пропускается
+    cells = set()
+    lat = south
+    while True:
+        lon = west
+        while True:
+            cells.add(encode_geohash(lat, lon, precision))
+            if lon >= east:
+                break
+            lon = min(lon + width, east)
+        if lat >= north:
+            break
+        lat = min(lat + height, north)
+    return sorted(cells)
+
+
+def distance_km(lat1, lon1, lat2, lon2):
+    """Расстояние по большому кругу (формула гаверсинусов)"""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    d_phi = phi2 - phi1
+    d_lambda = math.radians(lon2 - lon1)
+    a = math.sin(d_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(d_lambda / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
+
+
+def nearby_city_ids(city, radius_km):
+    """id городов не дальше radius_km от города city (включая его самого)"""
+    from .models import City
+
+    if city.latitude is None or city.longitude is None:
+        return [city.pk]
+
+    # Каждая ячейка - префиксный поиск LIKE 'ucfv%' по индексу geohash
+    cells = Q()
+    for cell in covering_cells(city.latitude, city.longitude, radius_km):
+        cells |= Q(geohash__startswith=cell)
+
+    return [
+        pk for pk, latitude, longitude in City.objects.filter(cells).values_list('pk', 'latitude', 'longitude')
+        if distance_km(city.latitude, city.longitude, latitude, longitude) <= radius_km
+    ]
@@ -0,0 +1,20 @@
+"""Битовая маска увлечений для векторной оценки совместимости (см. dating.recommendations)"""
+import re
+import zlib
+
+
+def hobby_mask(hobbies):
+    """
+    64-битная маска увлечений: каждое слово (по первым 6 буквам - грубый стемминг,
+    чтобы "путешествия" и "путешествовать" совпали) задает один бит.
+    """
+    mask = 0
+    for word in re.findall(r'\w{3,}', (hobbies or '').lower()):
+        mask |= 1 << (zlib.crc32(word[:6].encode()) % 64)
+    return mask
+
+
+def stored_hobby_mask(hobbies):
+    """Те же 64 бита как знаковое число - в диапазоне BigIntegerField"""
+    mask = hobby_mask(hobbies)
+    return mask - (1 << 64) if mask >= 1 << 63 else mask
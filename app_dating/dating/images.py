@@ -0,0 +1,51 @@
+import os
+from io import BytesIO
+
+# noinspection PyUnresolvedReferences
+from django.core.files.base import ContentFile
+# noinspection PyUnresolvedReferences
+from PIL import Image, ImageOps
+
+# Варианты фото: поле модели -> ширина в пикселях
+PHOTO_VARIANTS = {
+    'thumbnail': 160,
+    'card': 480,
+    'full': 1280,
+}
+VARIANT_FORMAT = 'WEBP'
+VARIANT_QUALITY = 80
+
+
+def render_variant(image, width):
+    """Уменьшает изображение до заданной ширины (без увеличения) и кодирует в WebP"""
+    variant = image.copy()
+    if variant.width > width:
+        height = round(variant.height * width / variant.width)
+        variant = variant.resize((width, height), Image.Resampling.LANCZOS)
+
+    buffer = BytesIO()
+    # EXIF и прочие метаданные не передаем - они не попадают в файл
+    variant.save(buffer, VARIANT_FORMAT, quality=VARIANT_QUALITY, method=4)
+    return buffer.getvalue()
+
+
+def generate_photo_variants(photo):
+    """
+    Создает для UserPhoto уменьшенные копии (thumbnail, card, full) в WebP.
+
+    Ориентация из EXIF применяется к пикселям, сами метаданные отбрасываются.
+    """
+    with photo.photo.open('rb') as source:
+        image = Image.open(source)
+        image = ImageOps.exif_transpose(image)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+    base_name = os.path.splitext(os.path.basename(photo.photo.name))[0]
+    for field_name, width in PHOTO_VARIANTS.items():
+        content = ContentFile(render_variant(image, width))
+        getattr(photo, field_name).save(f"{base_name}_{field_name}.webp", content, save=False)
+
+    # update() вместо save(): UserPhoto.save() заново переключает главное фото
+    type(photo).objects.filter(pk=photo.pk).update(**{
+        field_name: getattr(photo, field_name).name for field_name in PHOTO_VARIANTS
+    })
@@ -0,0 +1,143 @@
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import F
+# noinspection PyUnresolvedReferences
+from django.db.models.functions import Greatest
+from .matches import create_match, match_if_mutual
+from .models import User, UserInteraction
+from .notifications import notify
+from .queues import remove_from_queue
+from .seen import mark_seen
+
+# Взаимодействия-решения: у пары пользователей может быть только одно из них
+SWIPE_TYPES = ('like', 'dislike')
+
+
+def change_likes_count(user_id, delta):
+    """Атомарно меняет денормализованный счетчик лайков, не опускаясь ниже нуля"""
+    User.objects.filter(pk=user_id).update(
+        likes_count=Greatest(F('likes_count') + delta, 0)
+    )
+
+
+def record_swipe(from_user, to_user, interaction_type):
+    """
+    Сохраняет лайк/дизлайк и обновляет likes_count получателя в той же транзакции.
+    При взаимном лайке создает мэтч.
+
+    Возвращает (interaction, previous_type, match), где previous_type - тип
+    прежнего решения или None, если пользователь оценивает анкету впервые,
+    а match - новый мэтч или None.
+    """
+    with transaction.atomic():
+        # Блокируем обоих пользователей в порядке id, чтобы встречные свайпы
+        # одной пары выполнялись по очереди и не вызывали взаимоблокировок
+        list(User.objects.select_for_update().filter(
+            pk__in=[from_user.pk, to_user.pk]
+        ).order_by('pk').values_list('pk', flat=True))
+
+        interaction = UserInteraction.objects.select_for_update().filter(
+            from_user=from_user,
+            to_user=to_user,
+            interaction_type__in=SWIPE_TYPES
+        ).first()
+
+        previous_type = interaction.interaction_type if interaction else None
+        if previous_type == interaction_type:
+            return interaction, previous_type, None
+
+        if interaction is None:
+            transaction.on_commit(lambda: mark_seen(from_user.pk, [to_user.pk]))
+            interaction = UserInteraction.objects.create(
+                from_user=from_user,
+                to_user=to_user,
+                interaction_type=interaction_type
+            )
+        else:
+            interaction.interaction_type = interaction_type
+            interaction.save(update_fields=['interaction_type'])
+
+        match = None
+        if interaction_type == 'like':
+            change_likes_count(to_user.pk, 1)
+            notify(to_user.pk, 'like', user_id=from_user.pk, first_name=from_user.first_name)
+            match = match_if_mutual(from_user, to_user)
+        elif previous_type == 'like':
+            # Дизлайк заменил лайк
+            change_likes_count(to_user.pk, -1)
+
+    return interaction, previous_type, match
+
+
+def record_swipes(from_user, swipes):
+    """
+    Сохраняет пачку свайпов одного пользователя за одну транзакцию.
+
+    swipes - словарь {id получателя: 'like' | 'dislike'}. Строки пишутся одним
+    bulk_create с update_conflicts по уникальному ключу UserInteraction,
+    прежние решения противоположного типа удаляются одним DELETE, счетчики
+    лайков меняются групповыми UPDATE. Возвращает (количество сохраненных
+    свайпов, список id пользователей, с которыми появился мэтч).
+    """
+    target_ids = sorted(swipes)
+    if not target_ids:
+        return 0, []
+
+    with transaction.atomic():
+        list(User.objects.select_for_update().filter(
+            pk__in=[from_user.pk, *target_ids]
+        ).order_by('pk').values_list('pk', flat=True))
+
+        previous = dict(
+            UserInteraction.objects.filter(
+                from_user=from_user,
+                to_user_id__in=target_ids,
+                interaction_type__in=SWIPE_TYPES
+            ).values_list('to_user_id', 'interaction_type')
+        )
+        changed = {pk: action for pk, action in swipes.items() if previous.get(pk) != action}
+        if not changed:
+            return 0, []
+
+        # Прежнее решение другого типа заменяется новым
+        replaced = [pk for pk in changed if pk in previous]
+        if replaced:
+            UserInteraction.objects.filter(
+                from_user=from_user,
+                to_user_id__in=replaced,
+                interaction_type__in=SWIPE_TYPES
+            ).delete()
+
+        UserInteraction.objects.bulk_create(
+            [
+                UserInteraction(from_user=from_user, to_user_id=pk, interaction_type=action)
+                for pk, action in changed.items()
+            ],
+            update_conflicts=True,
+            unique_fields=['from_user', 'to_user', 'interaction_type'],
+            update_fields=['timestamp']
+        )
+
+        liked = [pk for pk, action in changed.items() if action == 'like']
+        unliked = [pk for pk, action in changed.items() if action == 'dislike' and previous.get(pk) == 'like']
+        if liked:
+            User.objects.filter(pk__in=liked).update(likes_count=F('likes_count') + 1)
+            for pk in liked:
+                notify(pk, 'like', user_id=from_user.pk, first_name=from_user.first_name)
+        if unliked:
+            User.objects.filter(pk__in=unliked).update(likes_count=Greatest(F('likes_count') - 1, 0))
+
+        # Взаимные лайки для всей пачки одним запросом
+        mutual = list(UserInteraction.objects.filter(
+            from_user_id__in=liked,
+            to_user=from_user,
+            interaction_type='like'
+        ).values_list('from_user_id', flat=True))
+        matched = [pk for pk in mutual if create_match(from_user.pk, pk)[1]]
+
+        # bulk_create не вызывает сигналы - обновляем очередь и фильтр явно
+        remove_from_queue(from_user.pk, list(changed))
+        transaction.on_commit(lambda: mark_seen(from_user.pk, list(changed)))
+
+    return len(changed), matched
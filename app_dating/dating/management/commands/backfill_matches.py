@@ -0,0 +1,60 @@
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import Exists, F, OuterRef
+from dating.matches import make_pair_key
+from dating.models import Match, UserInteraction
+
+
+class Command(BaseCommand):
+    help = 'Создает мэтчи для всех уже существующих взаимных лайков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        # Все взаимные пары одним запросом: лайк a -> b, для которого есть лайк b -> a.
+        # Условие from_user < to_user оставляет каждую пару один раз.
+        reciprocal = UserInteraction.objects.filter(
+            from_user=OuterRef('to_user'),
+            to_user=OuterRef('from_user'),
+            interaction_type='like'
+        )
+        pairs = UserInteraction.objects.filter(
+            interaction_type='like',
+            from_user__lt=F('to_user')
+        ).filter(Exists(reciprocal)).order_by().values_list('from_user_id', 'to_user_id')
+
+        created = 0
+        batch = []
+        for pair in pairs.iterator(chunk_size=batch_size):
+            batch.append(pair)
+            if len(batch) >= batch_size:
+                created += self._create_matches(batch)
+                batch = []
+        if batch:
+            created += self._create_matches(batch)
+
+        self.stdout.write(self.style.SUCCESS(f'Создано мэтчей: {created}'))
+
+    @staticmethod
+    def _create_matches(pairs):
+        keys = {make_pair_key(low, high): (low, high) for low, high in pairs}
+        existing = set(Match.objects.filter(pair_key__in=keys).values_list('pair_key', flat=True))
+        new_keys = [key for key in keys if key not in existing]
+        if not new_keys:
+            return 0
+
+        with transaction.atomic():
+            matches = Match.objects.bulk_create(Match(pair_key=key) for key in new_keys)
+            Through = Match.users.through
+            Through.objects.bulk_create(
+                Through(match_id=match.pk, user_id=user_id)
+                for match in matches
+                for user_id in keys[match.pair_key]
+            )
+        return len(matches)
@@ -0,0 +1,76 @@
+from pathlib import Path
+
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand, CommandError
+# noinspection PyUnresolvedReferences
+from django.test.utils import setup_test_environment, teardown_test_environment
+from dating.benchmarks import (
+    DEFAULT_TOLERANCE, METRICS, compare, default_subjects, load_baseline, run_benchmarks, save_baseline,
+)
+from dating.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет горячие представления (p50/p99, число и время SQL-запросов) '
+        'и сравнивает с сохраненной базовой линией'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=50)
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument('--user', type=int, help='id зрителя; по умолчанию первый активный пользователь')
+        parser.add_argument('--only', nargs='*', help='Запустить только указанные сценарии')
+        parser.add_argument(
+            '--baseline',
+            default=str(Path(settings.BASE_DIR) / 'benchmarks' / 'baseline.json'),
+        )
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE)
+        parser.add_argument(
+            '--save',
+            action='store_true',
+            help='Записать результаты как новую базовую линию'
+        )
+
+    def handle(self, *args, **options):
+        viewer, targets = default_subjects()
+        if options['user']:
+            viewer = User.objects.get(pk=options['user'])
+            targets = [pk for pk in targets if pk != viewer.pk]
+
+        # Тестовое окружение: testserver в ALLOWED_HOSTS, DEBUG выключен
+        # (иначе debug_toolbar попадает в замер)
+        setup_test_environment()
+        try:
+            results = run_benchmarks(
+                viewer, targets, options['iterations'], options['warmup'], options['only']
+            )
+        except RuntimeError as error:
+            raise CommandError(str(error))
+        finally:
+            teardown_test_environment()
+
+        baseline_path = Path(options['baseline'])
+        baseline = load_baseline(baseline_path)
+        self.stdout.write(f"{'сценарий':<16}" + ''.join(f'{metric:>10}' for metric in METRICS))
+        for name, metrics in results.items():
+            row = ''.join(f'{metrics[metric]:>10}' for metric in METRICS)
+            expected = baseline.get(name)
+            if expected:
+                row += '   (база: ' + ' / '.join(str(expected[metric]) for metric in METRICS) + ')'
+            self.stdout.write(f'{name:<16}{row}')
+
+        if options['save']:
+            save_baseline(baseline_path, {**baseline, **results})
+            self.stdout.write(self.style.SUCCESS(f'Базовая линия сохранена: {baseline_path}'))
+            return
+
+        regressions = compare(results, baseline, options['tolerance'])
+        if regressions:
+            raise CommandError('Регрессии производительности:\n' + '\n'.join(regressions))
+        if baseline:
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+        else:
+            self.stdout.write(self.style.WARNING('Базовая линия не найдена, запустите с --save'))
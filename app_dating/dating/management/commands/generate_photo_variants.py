@@ -0,0 +1,30 @@
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+from dating.models import UserPhoto
+from dating.tasks import process_photo
+
+
+class Command(BaseCommand):
+    help = 'Создает уменьшенные копии (thumbnail, card, full) для уже загруженных фото'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересоздать копии и для фото, у которых они уже есть'
+        )
+
+    def handle(self, *args, **options):
+        photos = UserPhoto.objects.order_by('pk')
+        if not options['all']:
+            photos = photos.filter(card='')
+
+        processed = 0
+        failed = 0
+        for photo in photos.iterator(chunk_size=100):
+            if process_photo(photo):
+                processed += 1
+            else:
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Обработано фото: {processed}, ошибок: {failed}'))
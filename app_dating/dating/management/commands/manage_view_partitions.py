@@ -0,0 +1,58 @@
+from datetime import timedelta
+
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+# noinspection PyUnresolvedReferences
+from django.db import connection
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
+from dating.models import ProfileView
+from dating.partitions import (
+    create_partition, default_partition_months, drop_partition, existing_partitions, partition_bounds,
+    planned_partitions,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Создает помесячные секции журнала просмотров наперед и удаляет секции '
+        'старше срока хранения (запускать по расписанию, например раз в сутки)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ahead', type=int, default=2, help='Сколько будущих месяцев подготовить')
+        parser.add_argument(
+            '--retention-days',
+            type=int,
+            default=getattr(settings, 'PROFILE_VIEW_RETENTION_DAYS', 90)
+        )
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['retention_days'])
+
+        if connection.vendor != 'postgresql':
+            # Без секционирования остается обычное удаление старых строк
+            deleted, _ = ProfileView.objects.filter(viewed_at__lt=cutoff).delete()
+            self.stdout.write(f'Удалено просмотров: {deleted}')
+            return
+
+        # Кроме будущих месяцев секции получают месяцы, чьи строки попали в секцию
+        # по умолчанию: тогда срок хранения соблюдается только удалением секций
+        existing = set(existing_partitions())
+        for name, start, end in planned_partitions(now, options['ahead']) + default_partition_months():
+            if name not in existing:
+                create_partition(name, start, end)
+                existing.add(name)
+                self.stdout.write(f'Создана секция {name}')
+
+        # Секция удаляется, только когда все ее строки старше срока хранения
+        for name in sorted(existing):
+            bounds = partition_bounds(name)
+            if bounds is not None and bounds[1] <= cutoff:
+                drop_partition(name)
+                self.stdout.write(f'Удалена секция {name}')
+
+        self.stdout.write(self.style.SUCCESS('Готово'))
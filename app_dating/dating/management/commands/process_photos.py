@@ -0,0 +1,32 @@
+import time
+
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+from dating.tasks import run_pending_photos
+
+
+class Command(BaseCommand):
+    help = 'Фоновый воркер: обрабатывает загруженные фото вне запроса'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=20)
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='Пауза в секундах, когда очередь пуста'
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь один раз и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        while True:
+            processed = run_pending_photos(batch_size)
+            if options['once'] and not processed:
+                break
+            if not processed:
+                time.sleep(options['sleep'])
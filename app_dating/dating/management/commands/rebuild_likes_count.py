@@ -0,0 +1,42 @@
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Max
+# noinspection PyUnresolvedReferences
+from django.db.models.functions import Coalesce
+from dating.models import User, UserInteraction
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает User.likes_count по таблице UserInteraction'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=10000,
+            help='Сколько пользователей обновлять одним UPDATE (по диапазону id)'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        likes = UserInteraction.objects.filter(
+            to_user=OuterRef('pk'),
+            interaction_type='like'
+        ).order_by().values('to_user').annotate(total=Count('id')).values('total')
+
+        max_id = User.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        updated = 0
+        # Один UPDATE с подзапросом на каждый диапазон id, без загрузки строк в Python
+        for start in range(0, max_id + 1, batch_size):
+            with transaction.atomic():
+                updated += User.objects.filter(
+                    id__gte=start,
+                    id__lt=start + batch_size
+                ).update(
+                    likes_count=Coalesce(Subquery(likes, output_field=IntegerField()), 0)
+                )
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано счетчиков: {updated}'))
@@ -0,0 +1,35 @@
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+from dating.models import User
+from dating.queues import QUEUE_SIZE, fan_out_pending, refresh_queue
+
+
+class Command(BaseCommand):
+    help = (
+        'Добавляет новые и измененные анкеты в очереди зрителей, затем пересчитывает '
+        'очереди кандидатов: устаревшие и еще не созданные (запускать по расписанию)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересчитать очереди всех активных пользователей'
+        )
+        parser.add_argument('--size', type=int, default=QUEUE_SIZE)
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        inserted = fan_out_pending(options['batch_size'])
+        self.stdout.write(f'Добавлено записей в очереди: {inserted}')
+
+        viewers = User.objects.filter(is_active=True).order_by('pk')
+        if not options['all']:
+            viewers = viewers.filter(candidate_queue__isnull=True) | viewers.filter(candidate_queue__is_stale=True)
+
+        refreshed = 0
+        for viewer in viewers.iterator(chunk_size=options['batch_size']):
+            refresh_queue(viewer, size=options['size'])
+            refreshed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'Пересчитано очередей: {refreshed}'))
@@ -0,0 +1,124 @@
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+from django.core.management import call_command
+# noinspection PyUnresolvedReferences
+from django.core.management.base import BaseCommand
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import Max, OuterRef, Subquery
+from dating.facets import invalidate_facets
+from dating.models import City, User, UserInteraction, UserPhoto
+from dating.seeding import (
+    CITIES, POPULARITY_SKEW, copy_rows, ensure_placeholder_photo, generate_interactions,
+    generate_users, power_law_sampler,
+)
+
+USER_COLUMNS = [
+    'password', 'is_superuser', 'username', 'first_name', 'last_name', 'email',
+    'is_staff', 'is_active', 'date_joined', 'gender', 'age', 'city', 'hobbies',
+    'hobby_mask', 'status', 'likes_count', 'views_count', 'is_private', 'created_at', 'updated_at',
+    'location_id',
+]
+PHOTO_COLUMNS = [
+    'user_id', 'photo', 'is_main', 'description', 'processing_state',
+    'processing_attempts', 'process_after', 'processing_error',
+    'thumbnail', 'card', 'full', 'uploaded_at',
+]
+INTERACTION_COLUMNS = ['from_user_id', 'to_user_id', 'interaction_type', 'timestamp']
+
+
+class Command(BaseCommand):
+    help = 'Заполняет БД синтетическими пользователями, фото, взаимодействиями и мэтчами для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000)
+        parser.add_argument('--interactions', type=int, default=100000)
+        parser.add_argument('--photos', type=int, default=1, help='Фото на пользователя')
+        parser.add_argument('--batch-size', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=None, help='Зерно генератора для повторяемости')
+        parser.add_argument(
+            '--prefix',
+            default='seed',
+            help='Префикс username/email; должен быть уникальным для каждого запуска'
+        )
+
+    def handle(self, *args, **options):
+        rng = np.random.default_rng(options['seed'])
+        batch_size = options['batch_size']
+        started = time.monotonic()
+
+        user_ids = self._seed_users(rng, options['users'], batch_size, options['prefix'])
+        self._log(started, f'пользователи: {len(user_ids)}')
+
+        if options['photos'] and len(user_ids):
+            photos = self._seed_photos(user_ids, options['photos'], batch_size)
+            self._log(started, f'фото: {photos}')
+
+        interactions = self._seed_interactions(rng, user_ids, options['interactions'], batch_size)
+        self._log(started, f'взаимодействия: {interactions}')
+
+        # Денормализованные данные пересчитываются пакетно, а не по строке
+        call_command('rebuild_likes_count', stdout=self.stdout)
+        call_command('backfill_matches', stdout=self.stdout)
+        invalidate_facets()
+        self._log(started, 'готово')
+
+    def _log(self, started, message):
+        self.stdout.write(f'[{time.monotonic() - started:7.1f} с] {message}')
+
+    def _seed_users(self, rng, count, batch_size, prefix):
+        max_id_before = User.objects.aggregate(max_id=Max('id'))['max_id'] or 0
+        locations = {name: City.objects.resolve(name).pk for name in CITIES}
+        for start in range(0, count, batch_size):
+            rows = (
+                {**row, 'location_id': locations[row['city']]}
+                for row in generate_users(rng, start, min(batch_size, count - start), prefix)
+            )
+            with transaction.atomic():
+                copy_rows(User, USER_COLUMNS, ([row[column] for column in USER_COLUMNS] for row in rows))
+
+        return np.fromiter(
+            User.objects.filter(id__gt=max_id_before, username__startswith=prefix).order_by('id').values_list(
+                'id', flat=True
+            ).iterator(chunk_size=batch_size),
+            dtype=np.int64
+        )
+
+    def _seed_photos(self, user_ids, per_user, batch_size):
+        path = ensure_placeholder_photo()
+        now = time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime())
+        users_per_batch = max(1, batch_size // per_user)
+        for start in range(0, len(user_ids), users_per_batch):
+            rows = (
+                [int(user_id), path, index == 0, '', 'ready', 0, now, '', '', '', '', now]
+                for user_id in user_ids[start:start + users_per_batch]
+                for index in range(per_user)
+            )
+            with transaction.atomic():
+                copy_rows(UserPhoto, PHOTO_COLUMNS, rows)
+
+        # Ссылка на главное фото одним UPDATE с подзапросом
+        main_photo = UserPhoto.objects.filter(user=OuterRef('pk'), is_main=True).values('pk')[:1]
+        User.objects.filter(id__gte=user_ids[0], id__lte=user_ids[-1]).update(main_photo=Subquery(main_photo))
+        return len(user_ids) * per_user
+
+    def _seed_interactions(self, rng, user_ids, total, batch_size):
+        if len(user_ids) < 2 or not total:
+            return 0
+        mean_per_user = total / len(user_ids)
+        popularity = power_law_sampler(len(user_ids), POPULARITY_SKEW)
+        # Порядок популярности не совпадает с порядком id
+        popular_ids = rng.permutation(user_ids)
+
+        senders_per_batch = max(1, int(batch_size / mean_per_user))
+        written = 0
+        for start in range(0, len(user_ids), senders_per_batch):
+            rows = generate_interactions(
+                rng, user_ids[start:start + senders_per_batch], popular_ids, popularity, mean_per_user
+            )
+            with transaction.atomic():
+                written += copy_rows(UserInteraction, INTERACTION_COLUMNS, rows)
+        return written
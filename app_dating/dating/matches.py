@@ -0,0 +1,44 @@
+# noinspection PyUnresolvedReferences
+from django.db import IntegrityError, transaction
+from .models import Match, UserInteraction
+from .notifications import notify
+
+
+def make_pair_key(user_a_id, user_b_id):
+    low, high = sorted((user_a_id, user_b_id))
+    return f"{low}:{high}"
+
+
+def create_match(user_a_id, user_b_id):
+    """Создает мэтч пары, если его еще нет. Возвращает (match, created)"""
+    pair_key = make_pair_key(user_a_id, user_b_id)
+    try:
+        with transaction.atomic():
+            match = Match.objects.create(pair_key=pair_key)
+            match.users.add(user_a_id, user_b_id)
+    except IntegrityError:
+        # Мэтч уже создан параллельным запросом
+        return Match.objects.get(pair_key=pair_key), False
+
+    notify(user_a_id, 'match', match_id=match.pk, user_id=user_b_id)
+    notify(user_b_id, 'match', match_id=match.pk, user_id=user_a_id)
+    return match, True
+
+
+def match_if_mutual(from_user, to_user):
+    """
+    Создает мэтч, если получатель лайка уже лайкнул отправителя.
+
+    Вызывается внутри транзакции record_swipe после блокировки строк обоих
+    пользователей, поэтому два одновременных встречных лайка выполняются
+    последовательно и второй из них видит первый.
+    """
+    reciprocal = UserInteraction.objects.filter(
+        from_user=to_user,
+        to_user=from_user,
+        interaction_type='like'
+    ).exists()
+    if not reciprocal:
+        return None
+    match, created = create_match(from_user.pk, to_user.pk)
+    return match if created else None
@@ -0,0 +1,185 @@
+"""
+Метрики горячих путей в формате Prometheus.
+
+Счетчики живут в памяти процесса: каждый воркер отдает свои значения на
+/metrics, а суммирует их Prometheus (у каждого воркера своя цель сбора).
+"""
+import logging
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+
+slow_query_logger = logging.getLogger('dating.slow_queries')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    """Гистограмма с фиксированными корзинами и метками"""
+
+    def __init__(self, name, help_text, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Счетчики по корзинам, затем сумма и общее число наблюдений
+                series = self._series[labels] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[-2] += value
+            series[-1] += 1
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            items = sorted((labels, list(series)) for labels, series in self._series.items())
+        for labels, series in items:
+            base = format_labels(self.label_names, labels)
+            for bound, count in zip(self.buckets, series):
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {count}')
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {series[-1]}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-2]}')
+            lines.append(f'{self.name}_count{{{base}}} {series[-1]}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class Counter:
+    def __init__(self, name, help_text, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = label_names
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with self._lock:
+            items = sorted(self._values.items())
+        for labels, value in items:
+            lines.append(f'{self.name}{{{format_labels(self.label_names, labels)}}} {value}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+def format_labels(names, values):
+    return ','.join(
+        '{}="{}"'.format(name, str(value).replace('\\', '\\\\').replace('"', '\\"'))
+        for name, value in zip(names, values)
+    )
+
+
+REQUEST_DURATION = Histogram(
+    'dating_request_duration_seconds', 'Время обработки запроса', ('view', 'method'), LATENCY_BUCKETS
+)
+REQUEST_QUERIES = Histogram(
+    'dating_request_db_queries', 'Число SQL-запросов за HTTP-запрос', ('view',), QUERY_COUNT_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    'dating_request_db_duration_seconds', 'Суммарное время SQL за HTTP-запрос', ('view',), LATENCY_BUCKETS
+)
+RESPONSES = Counter('dating_responses_total', 'Ответы по представлениям и кодам', ('view', 'status'))
+CACHE_REQUESTS = Counter('dating_cache_requests_total', 'Обращения к кэшам: hit/miss', ('cache', 'result'))
+SLOW_QUERIES = Counter('dating_slow_queries_total', 'SQL-запросы дольше METRICS_SLOW_QUERY_MS', ('view',))
+
+REGISTRY = [REQUEST_DURATION, REQUEST_QUERIES, REQUEST_DB_DURATION, RESPONSES, CACHE_REQUESTS, SLOW_QUERIES]
+
+
+class RequestStats:
+    __slots__ = ('queries', 'db_time', 'view')
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.view = None
+
+
+# Статистика текущего запроса; контекст копируется и в потоки sync_to_async
+current_stats = ContextVar('dating_request_stats', default=None)
+
+
+def record_cache(name, hit):
+    CACHE_REQUESTS.inc((name, 'hit' if hit else 'miss'))
+
+
+def query_timer(execute, sql, params, many, context):
+    """execute_wrapper: считает запросы и время SQL текущего HTTP-запроса"""
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - started
+        stats.queries += 1
+        stats.db_time += elapsed
+        threshold = getattr(settings, 'METRICS_SLOW_QUERY_MS', None)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            SLOW_QUERIES.inc((stats.view or 'unknown',))
+            # В лог попадает только выборка медленных запросов
+            if random.random() < getattr(settings, 'METRICS_SLOW_QUERY_SAMPLE_RATE', 1.0):
+                slow_query_logger.warning(
+                    'Медленный запрос %.1f мс (%s): %s', elapsed * 1000, stats.view or 'unknown', sql
+                )
+
+
+def install_query_timer(sender, connection, **kwargs):
+    """Обработчик connection_created: подключает query_timer к соединению один раз"""
+    if query_timer not in connection.execute_wrappers:
+        connection.execute_wrappers.append(query_timer)
+
+
+def start_request():
+    stats = RequestStats()
+    return stats, current_stats.set(stats), time.perf_counter()
+
+
+def finish_request(request, response, stats, token, started):
+    elapsed = time.perf_counter() - started
+    current_stats.reset(token)
+    match = getattr(request, 'resolver_match', None)
+    view = (match.view_name if match else None) or 'unmatched'
+    REQUEST_DURATION.observe((view, request.method), elapsed)
+    REQUEST_QUERIES.observe((view,), stats.queries)
+    REQUEST_DB_DURATION.observe((view,), stats.db_time)
+    RESPONSES.inc((view, response.status_code))
+
+
+def render_metrics():
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    for metric in REGISTRY:
+        metric.clear()
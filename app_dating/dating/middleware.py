@@ -0,0 +1,38 @@
+# noinspection PyUnresolvedReferences
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from .metrics import current_stats, finish_request, start_request
+
+
+class MetricsMiddleware:
+    """
+    Время ответа, число и время SQL-запросов по имени представления.
+    Работает и с синхронными, и с асинхронными представлениями.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats, token, started = start_request()
+        response = self.get_response(request)
+        finish_request(request, response, stats, token, started)
+        return response
+
+    async def __acall__(self, request):
+        stats, token, started = start_request()
+        response = await self.get_response(request)
+        finish_request(request, response, stats, token, started)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        # Имя представления нужно журналу медленных запросов еще до ответа
+        stats = current_stats.get()
+        if stats is not None:
+            stats.view = request.resolver_match.view_name
@@ -0,0 +1,64 @@
+# Generated by Django 5.2 on 2026-10-17 20:16
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+import dating.operations
+
+# Триггер поддерживает search_vector в актуальном состоянии при любой записи в таблицу,
+# включая bulk_create и update(), которые не вызывают save() и сигналы.
+CREATE_SEARCH_TRIGGER = """
+CREATE OR REPLACE FUNCTION dating_user_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.first_name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.last_name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.city, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.hobbies, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE TRIGGER dating_user_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF first_name, last_name, city, hobbies, search_vector
+    ON dating_user
+    FOR EACH ROW EXECUTE FUNCTION dating_user_search_vector_update();
+
+UPDATE dating_user SET search_vector = NULL;
+"""
+
+DROP_SEARCH_TRIGGER = """
+DROP TRIGGER IF EXISTS dating_user_search_vector_trigger ON dating_user;
+DROP FUNCTION IF EXISTS dating_user_search_vector_update();
+"""
+
+
+class Migration(migrations.Migration):
+
+    # CREATE INDEX CONCURRENTLY нельзя выполнять внутри транзакции
+    atomic = False
+
+    dependencies = [
+        ("dating", "0002_alter_user_gender_alter_user_username"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        dating.operations.PostgresRunSQL(
+            CREATE_SEARCH_TRIGGER,
+            DROP_SEARCH_TRIGGER,
+        ),
+        dating.operations.PostgresAddIndexConcurrently(
+            model_name="user",
+            index=django.contrib.postgres.indexes.GinIndex(
+                fields=["search_vector"], name="dating_user_search_gin"
+            ),
+        ),
+    ]
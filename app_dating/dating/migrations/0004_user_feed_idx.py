@@ -0,0 +1,23 @@
+# Generated by Django 5.2 on 2026-10-17 20:40
+
+from django.db import migrations, models
+
+import dating.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("dating", "0003_user_search_vector"),
+    ]
+
+    operations = [
+        dating.operations.PostgresAddIndexConcurrently(
+            model_name="user",
+            index=models.Index(
+                fields=["-created_at", "-id"], name="dating_user_feed_idx"
+            ),
+        ),
+    ]
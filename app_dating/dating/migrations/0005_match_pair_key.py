@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 20:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0004_user_feed_idx"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="match",
+            name="pair_key",
+            field=models.CharField(editable=False, max_length=41, null=True, unique=True),
+        ),
+    ]
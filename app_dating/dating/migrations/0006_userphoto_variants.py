@@ -0,0 +1,28 @@
+# Generated by Django 5.2 on 2026-10-17 20:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0005_match_pair_key"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userphoto",
+            name="card",
+            field=models.ImageField(blank=True, editable=False, upload_to="user_photos/variants/%Y/%m/%d/"),
+        ),
+        migrations.AddField(
+            model_name="userphoto",
+            name="full",
+            field=models.ImageField(blank=True, editable=False, upload_to="user_photos/variants/%Y/%m/%d/"),
+        ),
+        migrations.AddField(
+            model_name="userphoto",
+            name="thumbnail",
+            field=models.ImageField(blank=True, editable=False, upload_to="user_photos/variants/%Y/%m/%d/"),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2 on 2026-10-17 20:19
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0006_userphoto_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="userphoto",
+            name="process_after",
+            field=models.DateTimeField(default=django.utils.timezone.now, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userphoto",
+            name="processing_attempts",
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userphoto",
+            name="processing_error",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="userphoto",
+            name="processing_state",
+            field=models.CharField(choices=[("pending", "В обработке"), ("ready", "Готово"), ("failed", "Ошибка")], default="pending", editable=False, max_length=10, verbose_name="Обработка"),
+        ),
+        migrations.AddIndex(
+            model_name="userphoto",
+            index=models.Index(fields=["processing_state", "process_after"], name="dating_user_process_54b1bb_idx"),
+        ),
+    ]
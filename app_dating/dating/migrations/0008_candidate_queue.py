@@ -0,0 +1,43 @@
+# Generated by Django 5.2 on 2026-10-17 20:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0007_userphoto_processing"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CandidateQueue",
+            fields=[
+                ("user", models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name="candidate_queue", serialize=False, to=settings.AUTH_USER_MODEL, verbose_name="Пользователь")),
+                ("is_stale", models.BooleanField(default=True, verbose_name="Требует пересчета")),
+                ("refreshed_at", models.DateTimeField(blank=True, null=True, verbose_name="Пересчитана")),
+            ],
+            options={
+                "verbose_name": "Очередь кандидатов",
+                "verbose_name_plural": "Очереди кандидатов",
+                "indexes": [models.Index(fields=["is_stale"], name="dating_cand_is_stal_5713e0_idx")],
+            },
+        ),
+        migrations.CreateModel(
+            name="CandidateQueueEntry",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("score", models.FloatField(verbose_name="Оценка")),
+                ("candidate", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL, verbose_name="Кандидат")),
+                ("viewer", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="queued_candidates", to=settings.AUTH_USER_MODEL, verbose_name="Зритель")),
+            ],
+            options={
+                "verbose_name": "Кандидат в очереди",
+                "verbose_name_plural": "Кандидаты в очереди",
+                "indexes": [models.Index(fields=["viewer", "-score"], name="dating_cand_viewer__db5e9a_idx"), models.Index(fields=["candidate"], name="dating_cand_candida_9bf3c5_idx")],
+                "unique_together": {("viewer", "candidate")},
+            },
+        ),
+    ]
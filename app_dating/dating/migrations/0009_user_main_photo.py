@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 20:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_main_photo(apps, schema_editor):
+    """Проставляет User.main_photo и оставляет по одному (самому новому) главному фото"""
+    User = apps.get_model("dating", "User")
+    UserPhoto = apps.get_model("dating", "UserPhoto")
+
+    latest_main = UserPhoto.objects.filter(
+        user=models.OuterRef("pk"), is_main=True
+    ).order_by("-uploaded_at", "-pk").values("pk")[:1]
+    User.objects.update(main_photo=models.Subquery(latest_main))
+
+    UserPhoto.objects.filter(is_main=True).exclude(
+        pk__in=User.objects.filter(main_photo__isnull=False).values("main_photo")
+    ).update(is_main=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0008_candidate_queue"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="main_photo",
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="+", to="dating.userphoto", verbose_name="Главное фото"),
+        ),
+        migrations.RunPython(fill_main_photo, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="userphoto",
+            constraint=models.UniqueConstraint(condition=models.Q(("is_main", True)), fields=("user",), name="dating_userphoto_one_main"),
+        ),
+    ]
@@ -0,0 +1,101 @@
+# Generated by Django 5.2 on 2026-10-17 20:35
+
+import re
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from dating.geo import encode_geohash, normalize_city_name
+
+# Справочник крупных городов: (название, широта, долгота)
+CITIES = [
+    ("Москва", 55.7558, 37.6173),
+    ("Санкт-Петербург", 59.9343, 30.3351),
+    ("Новосибирск", 55.0084, 82.9357),
+    ("Екатеринбург", 56.8389, 60.6057),
+    ("Казань", 55.7963, 49.1088),
+    ("Нижний Новгород", 56.2965, 43.9361),
+    ("Челябинск", 55.1644, 61.4368),
+    ("Самара", 53.1959, 50.1002),
+    ("Омск", 54.9885, 73.3242),
+    ("Ростов-на-Дону", 47.2357, 39.7015),
+    ("Уфа", 54.7388, 55.9721),
+    ("Красноярск", 56.0153, 92.8932),
+    ("Воронеж", 51.6720, 39.1843),
+    ("Пермь", 58.0105, 56.2502),
+    ("Волгоград", 48.7080, 44.5133),
+    ("Краснодар", 45.0355, 38.9753),
+    ("Саратов", 51.5336, 46.0343),
+    ("Тюмень", 57.1530, 65.5343),
+    ("Тольятти", 53.5078, 49.4204),
+    ("Ижевск", 56.8526, 53.2045),
+    ("Ярославль", 57.6261, 39.8845),
+    ("Тверь", 56.8587, 35.9176),
+    ("Тула", 54.1931, 37.6173),
+    ("Калуга", 54.5293, 36.2754),
+    ("Подольск", 55.4242, 37.5547),
+    ("Химки", 55.8970, 37.4297),
+    ("Балашиха", 55.7963, 37.9382),
+    ("Мытищи", 55.9116, 37.7308),
+    ("Королёв", 55.9162, 37.8545),
+    ("Люберцы", 55.6766, 37.8982),
+]
+
+
+def fill_locations(apps, schema_editor):
+    """Заполняет справочник и привязывает пользователей к городам по названию"""
+    City = apps.get_model("dating", "City")
+    User = apps.get_model("dating", "User")
+
+    City.objects.bulk_create(
+        City(
+            name=name,
+            normalized_name=normalize_city_name(name),
+            latitude=latitude,
+            longitude=longitude,
+            geohash=encode_geohash(latitude, longitude),
+        )
+        for name, latitude, longitude in CITIES
+    )
+    cities = {city.normalized_name: city for city in City.objects.all()}
+
+    # Обновляем по каждому варианту написания: вариантов немного, пользователей много
+    for raw_name in list(User.objects.exclude(city="").values_list("city", flat=True).distinct()):
+        key = normalize_city_name(raw_name)
+        city = cities.get(key)
+        if city is None:
+            city = cities[key] = City.objects.create(name=re.sub(r"\s+", " ", raw_name.strip()), normalized_name=key)
+        User.objects.filter(city=raw_name).update(location=city, city=city.name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0009_user_main_photo"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="City",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100, verbose_name="Название")),
+                ("normalized_name", models.CharField(editable=False, max_length=100, unique=True)),
+                ("latitude", models.FloatField(blank=True, null=True, verbose_name="Широта")),
+                ("longitude", models.FloatField(blank=True, null=True, verbose_name="Долгота")),
+                ("geohash", models.CharField(blank=True, editable=False, max_length=12)),
+            ],
+            options={
+                "verbose_name": "Город",
+                "verbose_name_plural": "Города",
+                "ordering": ["name"],
+                "indexes": [models.Index(fields=["geohash"], name="dating_city_geohash_idx", opclasses=["varchar_pattern_ops"])],
+            },
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="location",
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name="residents", to="dating.city", verbose_name="Город (справочник)"),
+        ),
+        migrations.RunPython(fill_locations, migrations.RunPython.noop),
+    ]
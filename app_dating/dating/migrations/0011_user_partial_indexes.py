@@ -0,0 +1,48 @@
+# Generated by Django 5.2 on 2026-10-17 20:37
+
+from django.db import migrations, models
+
+import dating.operations
+
+
+class Migration(migrations.Migration):
+
+    atomic = False
+
+    dependencies = [
+        ("dating", "0010_city_user_location"),
+    ]
+
+    # Сначала создаем новые индексы, затем удаляем старые, чтобы лента
+    # ни в какой момент не оставалась без подходящего индекса
+    operations = [
+        dating.operations.ConcurrentAddIndex(
+            model_name="user",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["-created_at", "-id"], name="dating_user_active_feed_idx"),
+        ),
+        dating.operations.ConcurrentAddIndex(
+            model_name="user",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["gender", "-created_at", "-id"], name="dating_user_gender_feed_idx"),
+        ),
+        dating.operations.ConcurrentAddIndex(
+            model_name="user",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["location", "-created_at", "-id"], name="dating_user_location_feed_idx"),
+        ),
+        dating.operations.ConcurrentAddIndex(
+            model_name="user",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["age"], name="dating_user_age_idx"),
+        ),
+        dating.operations.ConcurrentAddIndex(
+            model_name="user",
+            index=models.Index(condition=models.Q(("is_active", True)), fields=["city", "gender", "status"], name="dating_user_facets_idx"),
+        ),
+        dating.operations.ConcurrentRemoveIndex(
+            model_name="user",
+            name="dating_user_gender_0c55e2_idx",
+        ),
+        # Индекс из 0004 создавался только на PostgreSQL
+        dating.operations.PostgresRemoveIndexConcurrently(
+            model_name="user",
+            name="dating_user_feed_idx",
+        ),
+    ]
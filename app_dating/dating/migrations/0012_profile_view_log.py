@@ -0,0 +1,81 @@
+# Generated by Django 5.2 on 2026-10-17 20:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+import dating.operations
+
+# На PostgreSQL таблица с тем же набором колонок и индексов, но секционированная
+# по viewed_at. Первичный ключ секционированной таблицы обязан включать ключ
+# секционирования. Состояние модели задает CreateModel в state_operations
+PARTITIONED_TABLE_SQL = """
+CREATE TABLE dating_profileview (
+    id bigint GENERATED BY DEFAULT AS IDENTITY,
+    viewer_id bigint NOT NULL REFERENCES dating_user (id) DEFERRABLE INITIALLY DEFERRED,
+    viewed_id bigint NOT NULL REFERENCES dating_user (id) DEFERRABLE INITIALLY DEFERRED,
+    viewed_at timestamp with time zone NOT NULL,
+    PRIMARY KEY (id, viewed_at)
+) PARTITION BY RANGE (viewed_at);
+CREATE INDEX dating_profileview_viewed_idx ON dating_profileview (viewed_id, viewed_at DESC);
+CREATE INDEX dating_profileview_viewer_idx ON dating_profileview (viewer_id, viewed_at DESC);
+CREATE TABLE dating_profileview_default PARTITION OF dating_profileview DEFAULT;
+"""
+
+
+def profile_view_model(operation):
+    """Одинаковое описание модели для состояния и для CREATE TABLE на остальных БД"""
+    return operation(
+        name="ProfileView",
+        fields=[
+            ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+            ("viewed_at", models.DateTimeField(default=django.utils.timezone.now, verbose_name="Когда")),
+            ("viewed", models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="profile_views", to=settings.AUTH_USER_MODEL, verbose_name="Чью анкету")),
+            ("viewer", models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="profile_views_made", to=settings.AUTH_USER_MODEL, verbose_name="Кто смотрел")),
+        ],
+        options={
+            "verbose_name": "Просмотр анкеты",
+            "verbose_name_plural": "Просмотры анкет",
+            "indexes": [models.Index(fields=["viewed", "-viewed_at"], name="dating_profileview_viewed_idx"), models.Index(fields=["viewer", "-viewed_at"], name="dating_profileview_viewer_idx")],
+        },
+    )
+
+
+def move_views(apps, schema_editor):
+    """Переносит просмотры из UserInteraction в журнал просмотров"""
+    UserInteraction = apps.get_model("dating", "UserInteraction")
+    ProfileView = apps.get_model("dating", "ProfileView")
+
+    views = UserInteraction.objects.filter(interaction_type="view")
+    batch = []
+    for from_user_id, to_user_id, timestamp in views.values_list("from_user_id", "to_user_id", "timestamp").iterator():
+        batch.append(ProfileView(viewer_id=from_user_id, viewed_id=to_user_id, viewed_at=timestamp))
+        if len(batch) >= 5000:
+            ProfileView.objects.bulk_create(batch)
+            batch = []
+    ProfileView.objects.bulk_create(batch)
+    views.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0011_user_partial_indexes"),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[profile_view_model(migrations.CreateModel)],
+            database_operations=[
+                dating.operations.PostgresRunSQL(PARTITIONED_TABLE_SQL, "DROP TABLE dating_profileview;"),
+                profile_view_model(dating.operations.NonPostgresCreateModel),
+            ],
+        ),
+        migrations.RunPython(move_views, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="userinteraction",
+            name="interaction_type",
+            field=models.CharField(choices=[("like", "Лайк"), ("dislike", "Дизлайк")], max_length=10, verbose_name="Тип взаимодействия"),
+        ),
+    ]
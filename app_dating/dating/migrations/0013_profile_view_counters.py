@@ -0,0 +1,76 @@
+# Generated by Django 5.2 on 2026-10-17 20:43
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery
+
+
+def fill_counters(apps, schema_editor):
+    """Счетчики и "кто смотрел" по уже накопленному журналу просмотров"""
+    User = apps.get_model("dating", "User")
+    ProfileView = apps.get_model("dating", "ProfileView")
+    ProfileViewer = apps.get_model("dating", "ProfileViewer")
+
+    pairs = ProfileView.objects.values("viewed_id", "viewer_id").annotate(last=Max("viewed_at")).order_by()
+    batch = []
+    for row in pairs.iterator():
+        batch.append(ProfileViewer(viewed_id=row["viewed_id"], viewer_id=row["viewer_id"], last_viewed_at=row["last"]))
+        if len(batch) >= 5000:
+            ProfileViewer.objects.bulk_create(batch)
+            batch = []
+    ProfileViewer.objects.bulk_create(batch)
+
+    views = ProfileView.objects.filter(viewed=OuterRef("pk")).order_by().values("viewed").annotate(
+        total=Count("*")
+    ).values("total")
+    User.objects.filter(pk__in=ProfileView.objects.values("viewed")).update(views_count=Subquery(views))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0012_profile_view_log"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProfileViewer",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("last_viewed_at", models.DateTimeField(verbose_name="Последний просмотр")),
+            ],
+            options={
+                "verbose_name": "Зритель анкеты",
+                "verbose_name_plural": "Зрители анкет",
+            },
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="views_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="Просмотры"),
+        ),
+        migrations.AddConstraint(
+            model_name="profileview",
+            constraint=models.UniqueConstraint(fields=("viewer", "viewed", "viewed_at"), name="dating_profileview_unique_minute"),
+        ),
+        migrations.AddField(
+            model_name="profileviewer",
+            name="viewed",
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name="viewers", to=settings.AUTH_USER_MODEL, verbose_name="Чью анкету"),
+        ),
+        migrations.AddField(
+            model_name="profileviewer",
+            name="viewer",
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name="+", to=settings.AUTH_USER_MODEL, verbose_name="Кто смотрел"),
+        ),
+        migrations.AddIndex(
+            model_name="profileviewer",
+            index=models.Index(fields=["viewed", "-last_viewed_at"], name="dating_prof_viewed__d5eaef_idx"),
+        ),
+        migrations.AlterUniqueTogether(
+            name="profileviewer",
+            unique_together={("viewed", "viewer")},
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2 on 2026-10-17 20:53
+
+from django.db import migrations, models
+
+from dating.hobbies import stored_hobby_mask
+
+
+def fill_hobby_masks(apps, schema_editor):
+    User = apps.get_model("dating", "User")
+
+    batch = []
+    for user in User.objects.exclude(hobbies="").only("id", "hobbies").iterator(chunk_size=5000):
+        user.hobby_mask = stored_hobby_mask(user.hobbies)
+        batch.append(user)
+        if len(batch) >= 5000:
+            User.objects.bulk_update(batch, ["hobby_mask"])
+            batch = []
+    User.objects.bulk_update(batch, ["hobby_mask"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0013_profile_view_counters"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="user",
+            name="hobby_mask",
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_hobby_masks, migrations.RunPython.noop),
+    ]
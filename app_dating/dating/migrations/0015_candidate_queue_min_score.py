@@ -0,0 +1,18 @@
+# Generated by Django 5.2 on 2026-10-17 20:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0014_user_hobby_mask"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="candidatequeue",
+            name="min_score",
+            field=models.FloatField(blank=True, null=True, verbose_name="Порог очереди"),
+        ),
+    ]
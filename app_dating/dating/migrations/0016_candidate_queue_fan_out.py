@@ -0,0 +1,22 @@
+# Generated by Django 5.2 on 2026-10-17 21:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("dating", "0015_candidate_queue_min_score"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="candidatequeue",
+            name="needs_fan_out",
+            field=models.BooleanField(default=False, verbose_name="Ждет добавления в очереди"),
+        ),
+        migrations.AddIndex(
+            model_name="candidatequeue",
+            index=models.Index(condition=models.Q(("needs_fan_out", True)), fields=["user"], name="dating_queue_fan_out_idx"),
+        ),
+    ]
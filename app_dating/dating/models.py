@@ -1,11 +1,62 @@
+import re
+
 # noinspection PyUnresolvedReferences
 from django.contrib.auth.models import AbstractUser
 # noinspection PyUnresolvedReferences
-from django.db import models
+from django.db import models, transaction
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
 # noinspection PyUnresolvedReferences
 from django.core.validators import MinValueValidator, MaxValueValidator
 # noinspection PyUnresolvedReferences
+from django.contrib.postgres.indexes import GinIndex
+# noinspection PyUnresolvedReferences
+from django.contrib.postgres.search import SearchVectorField
+# noinspection PyUnresolvedReferences
 from .validators import validate_age, validate_city
+from .geo import encode_geohash, normalize_city_name
+from .hobbies import stored_hobby_mask
+
+
+class CityManager(models.Manager):
+    def resolve(self, name):
+        """Город по названию в любом написании; неизвестный город создается без координат"""
+        city, _ = self.get_or_create(
+            normalized_name=normalize_city_name(name),
+            defaults={'name': re.sub(r'\s+', ' ', name.strip())}
+        )
+        return city
+
+
+class City(models.Model):
+    """Справочник городов с координатами для фильтров и поиска рядом"""
+    name = models.CharField(max_length=100, verbose_name='Название')
+    normalized_name = models.CharField(max_length=100, unique=True, editable=False)
+    latitude = models.FloatField(null=True, blank=True, verbose_name='Широта')
+    longitude = models.FloatField(null=True, blank=True, verbose_name='Долгота')
+    geohash = models.CharField(max_length=12, blank=True, editable=False)
+
+    objects = CityManager()
+
+    class Meta:
+        verbose_name = 'Город'
+        verbose_name_plural = 'Города'
+        ordering = ['name']
+        indexes = [
+            # Префиксный поиск LIKE 'abc%' по ячейкам geohash
+            models.Index(fields=['geohash'], name='dating_city_geohash_idx', opclasses=['varchar_pattern_ops']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_city_name(self.name)
+        if self.latitude is not None and self.longitude is not None:
+            self.geohash = encode_geohash(self.latitude, self.longitude)
+        else:
+            self.geohash = ''
+        super().save(*args, **kwargs)
 
 
 class User(AbstractUser):
@@ -42,25 +93,107 @@ class User(AbstractUser):
         verbose_name='Статус'
     )
     likes_count = models.PositiveIntegerField(default=0, verbose_name='Лайки')
+    # Обновляется пачками из буфера просмотров (см. dating.view_tracking)
+    views_count = models.PositiveIntegerField(default=0, verbose_name='Просмотры')
     is_private = models.BooleanField(default=False, verbose_name='Приватный профиль')
+    # Город из справочника; заполняется по полю city при сохранении
+    location = models.ForeignKey(
+        City,
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='residents',
+        editable=False,
+        verbose_name='Город (справочник)'
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Денормализованная ссылка на главное фото: карточки ленты получают его
+    # через JOIN без отдельного запроса к фотографиям
+    main_photo = models.ForeignKey(
+        'UserPhoto',
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name='+',
+        editable=False,
+        verbose_name='Главное фото'
+    )
+    # Заполняется триггером БД из имени, фамилии, города и увлечений
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Маска увлечений для рекомендаций; заполняется по полю hobbies при сохранении
+    hobby_mask = models.BigIntegerField(default=0, editable=False)
 
     REQUIRED_FIELDS = ['first_name', 'last_name', 'gender', 'age', 'city']
 
     class Meta:
         verbose_name = 'Пользователь'
         verbose_name_plural = 'Пользователи'
+        # Лента всегда фильтрует is_active=True и сортирует по (created_at, id),
+        # поэтому индексы ленты частичные и заканчиваются порядком сортировки
         indexes = [
-            models.Index(fields=['gender', 'age', 'city', 'status']),
             models.Index(fields=['-likes_count']),
+            GinIndex(fields=['search_vector'], name='dating_user_search_gin'),
+            # Лента без фильтров и с фильтрами по возрасту/статусу (keyset-пагинация)
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='dating_user_active_feed_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # Лента с фильтром по полу: равенство, затем порядок ленты
+            models.Index(
+                fields=['gender', '-created_at', '-id'],
+                name='dating_user_gender_feed_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # Город и поиск рядом (location_id IN ...), матрица рекомендаций
+            models.Index(
+                fields=['location', '-created_at', '-id'],
+                name='dating_user_location_feed_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # Узкий диапазон возраста без пола
+            models.Index(
+                fields=['age'],
+                name='dating_user_age_idx',
+                condition=models.Q(is_active=True)
+            ),
+            # Фасеты (GROUP BY city, gender, status) - покрывающий индекс, index-only scan
+            models.Index(
+                fields=['city', 'gender', 'status'],
+                name='dating_user_facets_idx',
+                condition=models.Q(is_active=True)
+            ),
         ]
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
 
+    def save(self, *args, **kwargs):
+        """
+        Привязываем пользователя к городу из справочника, приводим название
+        к единому виду и пересчитываем маску увлечений
+        """
+        update_fields = kwargs.get('update_fields')
+        if self.city and (update_fields is None or 'city' in update_fields):
+            self.location = City.objects.resolve(self.city)
+            self.city = self.location.name
+            if update_fields is not None:
+                kwargs['update_fields'] = {*update_fields, 'location'}
+        if update_fields is None or 'hobbies' in update_fields:
+            self.hobby_mask = stored_hobby_mask(self.hobbies)
+            if update_fields is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'hobby_mask'}
+        super().save(*args, **kwargs)
+
 
 class UserPhoto(models.Model):
+    PROCESSING_CHOICES = [
+        ('pending', 'В обработке'),
+        ('ready', 'Готово'),
+        ('failed', 'Ошибка')
+    ]
+
     user = models.ForeignKey(
         User,
         related_name='photos',
@@ -71,34 +204,111 @@ class UserPhoto(models.Model):
         upload_to='user_photos/%Y/%m/%d/',
         verbose_name='Фотография'
     )
+    # Уменьшенные копии для выдачи в браузер, создаются после загрузки
+    thumbnail = models.ImageField(upload_to='user_photos/variants/%Y/%m/%d/', blank=True, editable=False)
+    card = models.ImageField(upload_to='user_photos/variants/%Y/%m/%d/', blank=True, editable=False)
+    full = models.ImageField(upload_to='user_photos/variants/%Y/%m/%d/', blank=True, editable=False)
     is_main = models.BooleanField(default=False, verbose_name='Главное фото')
     uploaded_at = models.DateTimeField(auto_now_add=True)
     description = models.CharField(max_length=255, blank=True, verbose_name='Описание')
+    # Очередь фоновой обработки (см. dating.tasks и команду process_photos)
+    processing_state = models.CharField(
+        max_length=10,
+        choices=PROCESSING_CHOICES,
+        default='pending',
+        editable=False,
+        verbose_name='Обработка'
+    )
+    processing_attempts = models.PositiveSmallIntegerField(default=0, editable=False)
+    process_after = models.DateTimeField(default=timezone.now, editable=False)
+    processing_error = models.TextField(blank=True, editable=False)
 
     class Meta:
         verbose_name = 'Фотография пользователя'
         verbose_name_plural = 'Фотографии пользователей'
         ordering = ['-is_main', 'uploaded_at']
+        indexes = [
+            models.Index(fields=['processing_state', 'process_after']),
+        ]
+        constraints = [
+            # У пользователя не больше одного главного фото
+            models.UniqueConstraint(
+                fields=['user'],
+                condition=models.Q(is_main=True),
+                name='dating_userphoto_one_main'
+            ),
+        ]
 
     def __str__(self):
         return f"Фото {self.user.email}"
 
+    @property
+    def thumbnail_url(self):
+        return self.thumbnail.url if self.thumbnail else self.photo.url
+
+    @property
+    def card_url(self):
+        return self.card.url if self.card else self.photo.url
+
+    @property
+    def full_url(self):
+        return self.full.url if self.full else self.photo.url
+
+    @property
+    def srcset(self):
+        """Значение атрибута srcset; пустое, пока копии не созданы"""
+        from .images import PHOTO_VARIANTS
+
+        return ', '.join(
+            f"{getattr(self, field_name).url} {width}w"
+            for field_name, width in PHOTO_VARIANTS.items()
+            if getattr(self, field_name)
+        )
+
+    @staticmethod
+    def _lock_user(user_id):
+        """Блокирует строку пользователя, чтобы смены главного фото шли по очереди"""
+        list(User.objects.select_for_update().filter(pk=user_id).values_list('pk', flat=True))
+
+    @classmethod
+    def set_main(cls, user_id, photo_id):
+        """
+        Делает фото главным без загрузки строки: снимаем флаг со старого главного
+        фото и ставим новому в одной транзакции. Возвращает False, если у
+        пользователя нет такого фото.
+        """
+        with transaction.atomic():
+            cls._lock_user(user_id)
+            cls.objects.filter(user_id=user_id, is_main=True).exclude(pk=photo_id).update(is_main=False)
+            if not cls.objects.filter(pk=photo_id, user_id=user_id).update(is_main=True):
+                transaction.set_rollback(True)
+                return False
+            User.objects.filter(pk=user_id).update(main_photo=photo_id)
+        return True
+
     def save(self, *args, **kwargs):
         """При сохранении фото проверяем, чтобы было только одно главное фото"""
-        if self.is_main:
-            # Убираем главный статус у других фото этого пользователя
-            UserPhoto.objects.filter(
-                user=self.user,
-                is_main=True
-            ).update(is_main=False)
-        super().save(*args, **kwargs)
+        with transaction.atomic():
+            if self.is_main:
+                self._lock_user(self.user_id)
+                # Убираем главный статус у других фото этого пользователя
+                UserPhoto.objects.filter(
+                    user_id=self.user_id,
+                    is_main=True
+                ).exclude(pk=self.pk).update(is_main=False)
+            super().save(*args, **kwargs)
+
+            if self.is_main:
+                User.objects.filter(pk=self.user_id).update(main_photo=self)
+            else:
+                User.objects.filter(pk=self.user_id, main_photo=self).update(main_photo=None)
 
 
 class UserInteraction(models.Model):
+    # Просмотры хранятся отдельно, в журнале ProfileView
     INTERACTION_CHOICES = [
         ('like', 'Лайк'),
-        ('dislike', 'Дизлайк'),
-        ('view', 'Просмотр')
+        ('dislike', 'Дизлайк')
     ]
 
     from_user = models.ForeignKey(
@@ -135,12 +345,87 @@ class UserInteraction(models.Model):
         return f"{self.from_user} -> {self.to_user} ({self.interaction_type})"
 
 
+class ProfileView(models.Model):
+    """
+    Журнал просмотров анкет, только добавление. На PostgreSQL таблица
+    секционирована по месяцам viewed_at (команда manage_view_partitions),
+    старые просмотры удаляются целыми секциями.
+    """
+    viewer = models.ForeignKey(
+        User,
+        related_name='profile_views_made',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Кто смотрел'
+    )
+    viewed = models.ForeignKey(
+        User,
+        related_name='profile_views',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Чью анкету'
+    )
+    viewed_at = models.DateTimeField(default=timezone.now, verbose_name='Когда')
+
+    class Meta:
+        verbose_name = 'Просмотр анкеты'
+        verbose_name_plural = 'Просмотры анкет'
+        indexes = [
+            models.Index(fields=['viewed', '-viewed_at'], name='dating_profileview_viewed_idx'),
+            models.Index(fields=['viewer', '-viewed_at'], name='dating_profileview_viewer_idx'),
+        ]
+        constraints = [
+            # viewed_at округляется до минуты: повторные просмотры в пределах
+            # минуты дают одну строку. Ключ секционирования входит в ограничение,
+            # как того требует PostgreSQL
+            models.UniqueConstraint(
+                fields=['viewer', 'viewed', 'viewed_at'],
+                name='dating_profileview_unique_minute'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.viewer_id} -> {self.viewed_id} ({self.viewed_at:%d.%m.%Y %H:%M})"
+
+
+class ProfileViewer(models.Model):
+    """Кто смотрел анкету: одна строка на пару, агрегат журнала ProfileView"""
+    viewed = models.ForeignKey(
+        User,
+        related_name='viewers',
+        on_delete=models.CASCADE,
+        db_index=False,
+        verbose_name='Чью анкету'
+    )
+    viewer = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name='Кто смотрел'
+    )
+    last_viewed_at = models.DateTimeField(verbose_name='Последний просмотр')
+
+    class Meta:
+        verbose_name = 'Зритель анкеты'
+        verbose_name_plural = 'Зрители анкет'
+        unique_together = ['viewed', 'viewer']
+        indexes = [
+            # "Кто смотрел": WHERE viewed_id = ... ORDER BY last_viewed_at DESC
+            models.Index(fields=['viewed', '-last_viewed_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.viewer_id} -> {self.viewed_id} ({self.last_viewed_at:%d.%m.%Y %H:%M})"
+
+
 class Match(models.Model):
     users = models.ManyToManyField(
         User,
         related_name='matches',
         verbose_name='Пользователи'
     )
+    # "меньший_id:больший_id" - уникальный ключ пары, защищает от дублей мэтчей
+    pair_key = models.CharField(max_length=41, unique=True, null=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     is_active = models.BooleanField(default=True, verbose_name='Активный')
     last_interaction = models.DateTimeField(auto_now=True)
@@ -181,3 +466,66 @@ class ContactExchange(models.Model):
 
     def __str__(self):
         return f"Contact exchange in match {self.match.id}"
+
+
+class CandidateQueue(models.Model):
+    """Состояние предрассчитанной очереди кандидатов пользователя"""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        on_delete=models.CASCADE,
+        related_name='candidate_queue',
+        verbose_name='Пользователь'
+    )
+    is_stale = models.BooleanField(default=True, verbose_name='Требует пересчета')
+    refreshed_at = models.DateTimeField(null=True, blank=True, verbose_name='Пересчитана')
+    # Оценка последнего кандидата полной очереди; новые анкеты с оценкой
+    # выше вставляются в очередь сразу. Пусто - очередь не заполнена
+    min_score = models.FloatField(null=True, blank=True, verbose_name='Порог очереди')
+    # Анкету пользователя нужно разложить по очередям зрителей его города
+    # (новая регистрация или изменение профиля); делает refresh_candidate_queues
+    needs_fan_out = models.BooleanField(default=False, verbose_name='Ждет добавления в очереди')
+
+    class Meta:
+        verbose_name = 'Очередь кандидатов'
+        verbose_name_plural = 'Очереди кандидатов'
+        indexes = [
+            models.Index(fields=['is_stale']),
+            models.Index(
+                fields=['user'],
+                name='dating_queue_fan_out_idx',
+                condition=models.Q(needs_fan_out=True)
+            ),
+        ]
+
+    def __str__(self):
+        return f"Очередь {self.user_id}"
+
+
+class CandidateQueueEntry(models.Model):
+    viewer = models.ForeignKey(
+        User,
+        related_name='queued_candidates',
+        on_delete=models.CASCADE,
+        verbose_name='Зритель'
+    )
+    candidate = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+        verbose_name='Кандидат'
+    )
+    score = models.FloatField(verbose_name='Оценка')
+
+    class Meta:
+        verbose_name = 'Кандидат в очереди'
+        verbose_name_plural = 'Кандидаты в очереди'
+        unique_together = ['viewer', 'candidate']
+        indexes = [
+            # Выдача ленты: WHERE viewer_id = ... ORDER BY score DESC
+            models.Index(fields=['viewer', '-score']),
+            models.Index(fields=['candidate']),
+        ]
+
+    def __str__(self):
+        return f"{self.viewer_id} -> {self.candidate_id} ({self.score:.2f})"
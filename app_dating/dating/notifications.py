@@ -0,0 +1,88 @@
+import asyncio
+import json
+import threading
+from collections import defaultdict
+
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.utils.module_loading import import_string
+
+# Интервал, с которым в открытый SSE-поток отправляется комментарий keep-alive
+HEARTBEAT_INTERVAL = 15
+
+
+class InProcessBroker:
+    """
+    Pub/sub в памяти процесса: подписчики - asyncio-очереди открытых SSE-потоков.
+
+    Публиковать можно из любого потока (в том числе из синхронных view и
+    сигналов): событие передается в цикл событий подписчика через
+    call_soon_threadsafe. Работает в пределах одного процесса; для нескольких
+    воркеров укажите в NOTIFICATIONS_BROKER брокер с тем же интерфейсом.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+
+    def subscribe(self, user_id):
+        queue = asyncio.Queue()
+        with self._lock:
+            self._subscribers[user_id].add((asyncio.get_running_loop(), queue))
+        return queue
+
+    def unsubscribe(self, user_id, queue):
+        with self._lock:
+            subscribers = self._subscribers.get(user_id, set())
+            subscribers.difference_update({item for item in subscribers if item[1] is queue})
+            if not subscribers:
+                self._subscribers.pop(user_id, None)
+
+    def publish(self, user_id, event):
+        with self._lock:
+            subscribers = list(self._subscribers.get(user_id, ()))
+        for loop, queue in subscribers:
+            if not loop.is_closed():
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+
+
+_broker = None
+
+
+def get_broker():
+    """Брокер из настройки NOTIFICATIONS_BROKER (по умолчанию - в памяти процесса)"""
+    global _broker
+    if _broker is None:
+        path = getattr(settings, 'NOTIFICATIONS_BROKER', 'dating.notifications.InProcessBroker')
+        _broker = import_string(path)()
+    return _broker
+
+
+def notify(recipient_id, event_type, **data):
+    """Отправляет пользователю событие после фиксации текущей транзакции"""
+    event = {'type': event_type, **data}
+    transaction.on_commit(lambda: get_broker().publish(recipient_id, event))
+
+
+def format_sse(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+
+async def event_stream(user_id):
+    """Асинхронный генератор SSE-сообщений для одного пользователя"""
+    broker = get_broker()
+    queue = broker.subscribe(user_id)
+    try:
+        yield 'retry: 5000\n\n'
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), HEARTBEAT_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+            else:
+                yield format_sse(event)
+    finally:
+        broker.unsubscribe(user_id, queue)
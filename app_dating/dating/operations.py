@@ -0,0 +1,75 @@
+# noinspection PyUnresolvedReferences
+from django.contrib.postgres.operations import AddIndexConcurrently, RemoveIndexConcurrently
+# noinspection PyUnresolvedReferences
+from django.db import migrations
+
+
+class PostgresOnlyMixin:
+    """Выполняет операцию только на PostgreSQL, на остальных БД меняется лишь состояние"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class PostgresAddIndexConcurrently(PostgresOnlyMixin, AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY без блокировки таблицы (только PostgreSQL)"""
+
+
+class PostgresRemoveIndexConcurrently(PostgresOnlyMixin, RemoveIndexConcurrently):
+    """DROP INDEX CONCURRENTLY для индексов, созданных только на PostgreSQL"""
+
+
+class ConcurrentAddIndex(AddIndexConcurrently):
+    """CREATE INDEX CONCURRENTLY на PostgreSQL, обычный CREATE INDEX на остальных БД"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class ConcurrentRemoveIndex(RemoveIndexConcurrently):
+    """DROP INDEX CONCURRENTLY на PostgreSQL, обычный DROP INDEX на остальных БД"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class PostgresRunSQL(PostgresOnlyMixin, migrations.RunSQL):
+    """Сырой SQL, специфичный для PostgreSQL (триггеры, функции, партиции)"""
+
+
+class NonPostgresCreateModel(migrations.CreateModel):
+    """
+    CREATE TABLE на всех БД, кроме PostgreSQL: там таблицу создает сырой SQL
+    (например, секционированную) внутри SeparateDatabaseAndState
+    """
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor != 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,109 @@
+# noinspection PyUnresolvedReferences
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+# noinspection PyUnresolvedReferences
+from django.db.models import Q
+# noinspection PyUnresolvedReferences
+from django.utils.dateparse import parse_datetime
+# noinspection PyUnresolvedReferences
+from django.utils.http import urlsafe_base64_encode, urlsafe_base64_decode
+
+
+def encode_cursor(obj):
+    """Непрозрачный токен следующей страницы из пары (created_at, id)"""
+    raw = f"{obj.created_at.isoformat()}|{obj.pk}"
+    return urlsafe_base64_encode(raw.encode())
+
+
+def decode_cursor(cursor):
+    """Возвращает (created_at, id) или None, если токен поврежден"""
+    try:
+        created_at, pk = urlsafe_base64_decode(cursor).decode().split('|')
+        created_at = parse_datetime(created_at)
+        pk = int(pk)
+    except (ValueError, TypeError, UnicodeDecodeError):
+        return None
+    if created_at is None:
+        return None
+    return created_at, pk
+
+
+class CursorPage:
+    """
+    Страница keyset-пагинации по (created_at, id) в порядке убывания.
+
+    В отличие от Paginator не выполняет COUNT(*) и не использует OFFSET:
+    следующая страница начинается сразу после последней записи текущей,
+    поэтому глубокие страницы стоят столько же, сколько первая.
+
+    exclude - необязательная функция, которая по списку id возвращает флаги
+    "пропустить"; отброшенные записи добираются следующими порциями.
+    """
+
+    # Сколько порций максимум читаем, чтобы заполнить страницу при exclude
+    MAX_BATCHES = 5
+
+    def __init__(self, queryset, cursor=None, per_page=10, exclude=None):
+        self.cursor = cursor
+        position = decode_cursor(cursor) if cursor else None
+        queryset = queryset.order_by('-created_at', '-id')
+
+        # Берем на одну запись больше, чтобы узнать, есть ли следующая страница
+        batch_size = per_page + 1 if exclude is None else (per_page + 1) * 2
+        rows = []
+        for _ in range(self.MAX_BATCHES):
+            batch = list(self._after(queryset, position)[:batch_size])
+            if exclude is None:
+                rows.extend(batch)
+            else:
+                skip = exclude([obj.pk for obj in batch])
+                rows.extend(obj for obj, skipped in zip(batch, skip) if not skipped)
+            if len(rows) > per_page or len(batch) < batch_size:
+                break
+            position = (batch[-1].created_at, batch[-1].pk)
+
+        self.object_list = rows[:per_page]
+        if len(rows) > per_page:
+            self.next_cursor = encode_cursor(self.object_list[-1])
+        elif len(batch) == batch_size:
+            # Порции кончились раньше, чем набралась страница (почти все
+            # отброшены): продолжаем после последней прочитанной записи,
+            # даже если на этой странице не осталось ни одной
+            self.next_cursor = encode_cursor(batch[-1])
+        else:
+            self.next_cursor = None
+
+    @staticmethod
+    def _after(queryset, position):
+        if not position:
+            return queryset
+        created_at, pk = position
+        # Избыточное условие created_at <= ... дает планировщику диапазон по индексу
+        return queryset.filter(created_at__lte=created_at).filter(
+            Q(created_at__lt=created_at) | Q(id__lt=pk)
+        )
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return bool(self.cursor)
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+def numbered_page(object_list, page, per_page=10):
+    """Обычная страница Paginator; некорректный номер дает первую или последнюю страницу"""
+    paginator = Paginator(object_list, per_page)
+    try:
+        return paginator.page(page)
+    except PageNotAnInteger:
+        return paginator.page(1)
+    except EmptyPage:
+        return paginator.page(paginator.num_pages)
@@ -0,0 +1,111 @@
+"""
+Помесячные секции журнала просмотров (PostgreSQL, декларативное секционирование).
+
+Секции создаются заранее командой manage_view_partitions, устаревшие
+отсоединяются и удаляются целиком - без массового DELETE и раздувания таблицы.
+Строки вне существующих секций попадают в секцию по умолчанию; для их месяцев
+(например, истории, перенесенной при миграции) команда создает секции и
+переносит туда строки, так что секция по умолчанию остается пустой.
+"""
+import re
+from datetime import datetime, timezone as dt_timezone
+
+# noinspection PyUnresolvedReferences
+from django.db import connection, transaction
+
+PARENT_TABLE = 'dating_profileview'
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_RE = re.compile(rf'^{PARENT_TABLE}_y(\d{{4}})m(\d{{2}})$')
+
+
+def month_start(year, month):
+    """Начало месяца; month может выходить за 1..12"""
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    return datetime(year, month, 1, tzinfo=dt_timezone.utc)
+
+
+def partition_name(start):
+    return f'{PARENT_TABLE}_y{start.year:04d}m{start.month:02d}'
+
+
+def partition_bounds(name):
+    """(начало, конец) секции по ее имени или None для чужих таблиц"""
+    match = PARTITION_RE.match(name)
+    if match is None:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    return month_start(year, month), month_start(year, month + 1)
+
+
+def planned_partitions(now, ahead):
+    """Секции текущего месяца и ahead следующих: [(имя, начало, конец)]"""
+    return [
+        (partition_name(month_start(now.year, now.month + offset)),
+         month_start(now.year, now.month + offset),
+         month_start(now.year, now.month + offset + 1))
+        for offset in range(ahead + 1)
+    ]
+
+
+def default_partition_months():
+    """Секции для месяцев, строки которых лежат в секции по умолчанию: [(имя, начало, конец)]"""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"SELECT DISTINCT date_trunc('month', viewed_at AT TIME ZONE 'UTC') "
+            f'FROM {connection.ops.quote_name(DEFAULT_PARTITION)}'
+        )
+        months = sorted(row[0] for row in cursor.fetchall())
+    return [
+        (partition_name(month_start(month.year, month.month)),
+         month_start(month.year, month.month),
+         month_start(month.year, month.month + 1))
+        for month in months
+    ]
+
+
+def existing_partitions():
+    with connection.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE parent.relname = %s
+            """,
+            [PARENT_TABLE]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def create_partition(name, start, end):
+    """
+    Создает секцию [start, end). Строки этого диапазона, уже попавшие в секцию
+    по умолчанию, переносятся в новую секцию в той же транзакции - иначе
+    PostgreSQL не даст ее подключить.
+    """
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f'CREATE TABLE {quote(name)} (LIKE {quote(PARENT_TABLE)} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'
+        )
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {quote(DEFAULT_PARTITION)} '
+            f'WHERE viewed_at >= %s AND viewed_at < %s RETURNING *) '
+            f'INSERT INTO {quote(name)} SELECT * FROM moved',
+            [start, end]
+        )
+        cursor.execute(
+            f'ALTER TABLE {quote(PARENT_TABLE)} ATTACH PARTITION {quote(name)} '
+            f'FOR VALUES FROM (%s) TO (%s)',
+            [start, end]
+        )
+
+
+def drop_partition(name):
+    quote = connection.ops.quote_name
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE {quote(PARENT_TABLE)} DETACH PARTITION {quote(name)}')
+        cursor.execute(f'DROP TABLE {quote(name)}')
+
@@ -0,0 +1,63 @@
+# noinspection PyUnresolvedReferences
+from asgiref.sync import sync_to_async
+# noinspection PyUnresolvedReferences
+from django.core.cache import cache
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import Max
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
+from .metrics import record_cache
+from .models import User
+
+PROFILE_CACHE_TIMEOUT = 60 * 5
+
+
+def _version_key(user_id):
+    return f'dating:profile_version:{user_id}'
+
+
+def html_key(user_id, version):
+    return f'dating:profile_html:{user_id}:{version}'
+
+
+def build_profile_version(user_id):
+    """
+    Версия публичного профиля: updated_at пользователя и время последней
+    загрузки фото. None, если активного пользователя нет.
+    """
+    row = User.objects.filter(pk=user_id, is_active=True).aggregate(
+        updated_at=Max('updated_at'),
+        photo_uploaded_at=Max('photos__uploaded_at')
+    )
+    if row['updated_at'] is None:
+        return None
+    photo_uploaded_at = row['photo_uploaded_at'].timestamp() if row['photo_uploaded_at'] else 0
+    version = f"{row['updated_at'].timestamp()}-{photo_uploaded_at}"
+    cache.set(_version_key(user_id), version, PROFILE_CACHE_TIMEOUT)
+    return version
+
+
+async def aget_profile_version(user_id):
+    """Версия профиля из кэша; к БД обращаемся только при промахе"""
+    version = await cache.aget(_version_key(user_id))
+    record_cache('profile_version', version is not None)
+    if version is None:
+        version = await sync_to_async(build_profile_version)(user_id)
+    return version
+
+
+def invalidate_profile(user_id):
+    # Только после коммита: иначе параллельный запрос успеет закэшировать
+    # профиль по еще не измененным данным, и он продержится весь таймаут
+    transaction.on_commit(lambda: cache.delete(_version_key(user_id)))
+
+
+def touch_profile(user_id):
+    """
+    Изменение фото (удаление, смена главного, готовые копии) не меняет ни
+    updated_at, ни время последней загрузки, поэтому сдвигаем updated_at явно.
+    """
+    User.objects.filter(pk=user_id).update(updated_at=timezone.now())
+    invalidate_profile(user_id)
@@ -0,0 +1,155 @@
+import numpy as np
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import FloatField, Value
+# noinspection PyUnresolvedReferences
+from django.db.models.functions import Coalesce
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
+from .models import CandidateQueue, CandidateQueueEntry, User, UserInteraction
+from .recommendations import (
+    GENDER_CODES, code_case, recommend, recommend_user_ids, score_for_viewers,
+)
+
+# Сколько кандидатов хранится в очереди каждого пользователя
+QUEUE_SIZE = 200
+
+# Поля профиля, от которых зависит оценка кандидатов
+QUEUE_FIELDS = ('gender', 'age', 'city', 'hobbies', 'status', 'is_active')
+
+
+def queued_candidate_ids(viewer, limit=QUEUE_SIZE):
+    """Очередь кандидатов зрителя одним индексным чтением; пустой список, если очереди нет"""
+    return list(
+        CandidateQueueEntry.objects.filter(viewer=viewer).order_by('-score').values_list(
+            'candidate_id', flat=True
+        )[:limit]
+    )
+
+
+def candidate_ids(viewer, limit=QUEUE_SIZE):
+    """Рекомендованные анкеты: предрассчитанная очередь, а пока ее нет - расчет на лету"""
+    return queued_candidate_ids(viewer, limit) or recommend_user_ids(viewer, limit=limit)
+
+
+def refresh_queue(viewer, size=QUEUE_SIZE):
+    """Полностью пересчитывает очередь одного пользователя"""
+    ranked = recommend(viewer, limit=size)
+    with transaction.atomic():
+        CandidateQueueEntry.objects.filter(viewer=viewer).delete()
+        CandidateQueueEntry.objects.bulk_create(
+            CandidateQueueEntry(viewer=viewer, candidate_id=pk, score=score)
+            for pk, score in ranked
+        )
+        CandidateQueue.objects.update_or_create(
+            user=viewer,
+            defaults={
+                'is_stale': False,
+                'refreshed_at': timezone.now(),
+                'min_score': ranked[-1][1] if len(ranked) >= size else None,
+            }
+        )
+    return len(ranked)
+
+
+# Строка зрителя для оценки новой анкеты
+VIEWER_ROW = np.dtype([
+    ('id', np.int64),
+    ('gender', np.int8),
+    ('age', np.float32),
+    ('hobbies', np.int64),
+    ('likes', np.float32),
+    ('threshold', np.float64),
+])
+
+
+def add_candidate(candidate):
+    """
+    Вставляет анкету в очереди зрителей ее города, если она проходит в их
+    лучшие QUEUE_SIZE (оценка выше порога очереди). Очередь может временно
+    стать длиннее - лишнее отрежет следующий пересчет.
+    """
+    if not candidate.is_active or candidate.location_id is None:
+        return 0
+
+    viewers = np.array(
+        list(
+            # Только уже собранные очереди: до первого пересчета лента считается на лету
+            CandidateQueue.objects.filter(
+                user__location_id=candidate.location_id, user__is_active=True, refreshed_at__isnull=False
+            ).exclude(user_id=candidate.pk).annotate(
+                gender_code=code_case('user__gender', GENDER_CODES),
+                # Оценки неотрицательны: незаполненная очередь принимает любую анкету
+                threshold=Coalesce('min_score', Value(-1.0), output_field=FloatField()),
+            ).values_list(
+                'user_id', 'gender_code', 'user__age', 'user__hobby_mask', 'user__likes_count', 'threshold'
+            )
+        ),
+        dtype=VIEWER_ROW
+    )
+    if not len(viewers):
+        return 0
+
+    # Зрители с очередями - это активные пользователи города, поэтому
+    # популярность нормируется так же, как в матрице кандидатов
+    max_likes = max(float(viewers['likes'].max()), candidate.likes_count)
+    scores = score_for_viewers(
+        candidate, viewers['gender'], viewers['age'], viewers['hobbies'].astype(np.uint64), max_likes
+    )
+
+    # Зрители, которые уже оценивали анкету (например, до ее деактивации)
+    swiped = np.fromiter(
+        UserInteraction.objects.filter(to_user=candidate, interaction_type__in=('like', 'dislike')).values_list(
+            'from_user_id', flat=True
+        ),
+        dtype=np.int64
+    )
+    keep = (scores > viewers['threshold']) & ~np.isin(viewers['id'], swiped)
+
+    CandidateQueueEntry.objects.bulk_create(
+        [
+            CandidateQueueEntry(viewer_id=viewer_id, candidate_id=candidate.pk, score=score)
+            for viewer_id, score in zip(viewers['id'][keep].tolist(), scores[keep].tolist())
+        ],
+        batch_size=1000,
+        ignore_conflicts=True
+    )
+    return int(keep.sum())
+
+
+def mark_stale(user_id, fan_out=False):
+    """
+    Очередь пользователя будет пересчитана при следующем запуске
+    refresh_candidate_queues; с fan_out=True его анкета там же будет
+    разложена по очередям зрителей (см. add_candidate)
+    """
+    defaults = {'is_stale': True}
+    if fan_out:
+        defaults['needs_fan_out'] = True
+    CandidateQueue.objects.update_or_create(user_id=user_id, defaults=defaults)
+
+
+def fan_out_pending(batch_size=500):
+    """Добавляет в очереди зрителей анкеты, отмеченные mark_stale(fan_out=True)"""
+    pending = CandidateQueue.objects.filter(needs_fan_out=True).values_list('user_id', flat=True)
+    inserted = 0
+    for user_id in pending.iterator(chunk_size=batch_size):
+        # Флаг снимается до чтения профиля: изменение во время обработки
+        # поставит его снова, и анкета обработается при следующем запуске
+        if not CandidateQueue.objects.filter(user_id=user_id, needs_fan_out=True).update(needs_fan_out=False):
+            continue
+        candidate = User.objects.filter(pk=user_id).first()
+        if candidate is not None:
+            inserted += add_candidate(candidate)
+    return inserted
+
+
+def remove_candidate(candidate_id):
+    """Убирает пользователя из всех очередей (деактивация, смена города или оценки)"""
+    CandidateQueueEntry.objects.filter(candidate_id=candidate_id).delete()
+
+
+def remove_from_queue(viewer_id, candidate_ids):
+    """Убирает из очереди зрителя анкеты, которые он уже оценил"""
+    CandidateQueueEntry.objects.filter(viewer_id=viewer_id, candidate_id__in=candidate_ids).delete()
@@ -0,0 +1,227 @@
+import logging
+import threading
+import time
+
+import numpy as np
+# noinspection PyUnresolvedReferences
+from django.db import connection
+# noinspection PyUnresolvedReferences
+from django.db.models import Case, IntegerField, Value, When
+
+from .geo import normalize_city_name
+from .hobbies import hobby_mask
+from .metrics import record_cache
+from .models import User
+from .seen import get_seen_filter
+
+logger = logging.getLogger(__name__)
+
+# Веса составляющих итоговой оценки кандидата
+WEIGHTS = {
+    'gender': 3.0,
+    'age': 2.0,
+    'hobbies': 2.0,
+    'status': 1.0,
+    'popularity': 1.0,
+}
+# Разница в возрасте, при которой совместимость по возрасту падает в e раз
+AGE_SCALE = 5.0
+# Матрица кандидатов города пересобирается не чаще, чем раз в MATRIX_TTL секунд
+MATRIX_TTL = 60
+
+GENDER_CODES = {'M': 0, 'F': 1}
+STATUS_CODES = {code: index for index, (code, _) in enumerate(User.STATUS_CHOICES)}
+
+# Строка матрицы: коды пола и статуса вычисляет БД, маска увлечений хранится в User
+MATRIX_ROW = np.dtype([
+    ('id', np.int64),
+    ('gender', np.int8),
+    ('age', np.float32),
+    ('status', np.int8),
+    ('likes', np.float32),
+    ('hobbies', np.int64),
+])
+
+_matrix_cache = {}
+# Города, матрицы которых сейчас пересобираются в фоне
+_rebuilding = set()
+_rebuild_lock = threading.Lock()
+
+
+def code_case(field, codes):
+    """CASE, заменяющий значения поля числовыми кодами (-1 для неизвестных)"""
+    return Case(
+        *(When(**{field: value}, then=Value(code)) for value, code in codes.items()),
+        default=Value(-1),
+        output_field=IntegerField()
+    )
+
+
+def popcount(values):
+    """Количество единичных бит в каждом элементе массива uint64"""
+    if hasattr(np, 'bitwise_count'):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+class CandidateMatrix:
+    """Компактное представление активных анкет одного города в виде столбцов NumPy"""
+
+    def __init__(self, ids, genders, ages, statuses, likes, hobbies):
+        self.ids = ids
+        self.genders = genders
+        self.ages = ages
+        self.statuses = statuses
+        self.likes = likes
+        self.hobbies = hobbies
+        self.built_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.ids)
+
+    @classmethod
+    def build(cls, city):
+        rows = np.array(
+            list(
+                # Через справочник городов: поиск по индексу (location_id) WHERE is_active
+                User.objects.filter(is_active=True, location__normalized_name=normalize_city_name(city)).annotate(
+                    gender_code=code_case('gender', GENDER_CODES),
+                    status_code=code_case('status', STATUS_CODES),
+                ).values_list('id', 'gender_code', 'age', 'status_code', 'likes_count', 'hobby_mask').order_by()
+            ),
+            dtype=MATRIX_ROW
+        )
+        return cls(
+            ids=rows['id'],
+            genders=rows['gender'],
+            ages=rows['age'],
+            statuses=rows['status'],
+            likes=rows['likes'],
+            hobbies=rows['hobbies'].astype(np.uint64),
+        )
+
+
+def get_candidate_matrix(city):
+    """
+    Матрица кандидатов города из памяти процесса. Устаревшая (старше MATRIX_TTL)
+    матрица отдается как есть, а новая собирается в фоновом потоке - запрос
+    ждет сборки, только если матрицы города в процессе еще нет.
+    """
+    key = normalize_city_name(city)
+    matrix = _matrix_cache.get(key)
+    fresh = matrix is not None and time.monotonic() - matrix.built_at <= MATRIX_TTL
+    record_cache('candidate_matrix', fresh)
+    if matrix is None:
+        matrix = CandidateMatrix.build(city)
+        _matrix_cache[key] = matrix
+    elif not fresh:
+        schedule_rebuild(key, city)
+    return matrix
+
+
+def schedule_rebuild(key, city):
+    with _rebuild_lock:
+        if key in _rebuilding:
+            return
+        _rebuilding.add(key)
+    threading.Thread(target=_rebuild, args=(key, city), daemon=True).start()
+
+
+def _rebuild(key, city):
+    try:
+        _matrix_cache[key] = CandidateMatrix.build(city)
+    except Exception:
+        logger.exception('Не удалось пересобрать матрицу кандидатов города %s', city)
+    finally:
+        # У потока свое соединение с БД
+        connection.close()
+        with _rebuild_lock:
+            _rebuilding.discard(key)
+
+
+def clear_candidate_cache():
+    _matrix_cache.clear()
+
+
+def compatibility(gender, age, hobbies, genders, ages, hobby_masks):
+    """
+    Симметричная часть оценки - пол, возраст и общие увлечения одного
+    пользователя против массивов других (в любую сторону: зритель против
+    кандидатов или кандидат против зрителей)
+    """
+    gender = (genders != gender).astype(np.float32)
+
+    age = np.exp(-np.abs(ages - np.float32(age)) / AGE_SCALE)
+
+    hobbies = np.uint64(hobbies)
+    common = popcount(hobby_masks & hobbies).astype(np.float32)
+    total = popcount(hobby_masks | hobbies).astype(np.float32)
+    hobbies = np.divide(common, total, out=np.zeros_like(common), where=total > 0)
+
+    return WEIGHTS['gender'] * gender + WEIGHTS['age'] * age + WEIGHTS['hobbies'] * hobbies
+
+
+def score_candidates(viewer, matrix):
+    """Векторная оценка всех кандидатов матрицы для зрителя"""
+    scores = compatibility(
+        GENDER_CODES.get(viewer.gender, -1), viewer.age, hobby_mask(viewer.hobbies),
+        matrix.genders, matrix.ages, matrix.hobbies
+    )
+
+    status = (matrix.statuses == STATUS_CODES['looking']).astype(np.float32)
+
+    popularity = np.log1p(matrix.likes)
+    if len(popularity) and popularity.max() > 0:
+        popularity /= popularity.max()
+
+    return scores + WEIGHTS['status'] * status + WEIGHTS['popularity'] * popularity
+
+
+def score_for_viewers(candidate, genders, ages, hobby_masks, max_likes):
+    """
+    Оценка одного кандидата для массива зрителей - та же, что дает
+    score_candidates; max_likes - наибольшее число лайков в городе
+    """
+    scores = compatibility(
+        GENDER_CODES.get(candidate.gender, -1), candidate.age, hobby_mask(candidate.hobbies),
+        genders, ages, hobby_masks
+    )
+    status = float(candidate.status == 'looking')
+    popularity = 0.0
+    if max_likes > 0:
+        popularity = min(np.log1p(candidate.likes_count) / np.log1p(max_likes), 1.0)
+    return scores + WEIGHTS['status'] * status + WEIGHTS['popularity'] * popularity
+
+
+def recommend(viewer, limit=100, exclude_ids=None):
+    """
+    Лучшие кандидаты для зрителя: список пар (id, оценка) по убыванию оценки.
+
+    Исключаются сам зритель и все, кого он уже лайкнул или дизлайкнул.
+    """
+    matrix = get_candidate_matrix(viewer.city)
+    if not len(matrix):
+        return []
+
+    scores = score_candidates(viewer, matrix)
+    if exclude_ids is None:
+        # Уже оцененные анкеты - по фильтру Блума зрителя, без запроса к БД
+        scores[get_seen_filter(viewer.pk).contains(matrix.ids)] = -np.inf
+    else:
+        scores[np.isin(matrix.ids, np.fromiter(exclude_ids, dtype=np.int64))] = -np.inf
+    scores[matrix.ids == viewer.pk] = -np.inf
+
+    available = int(np.isfinite(scores).sum())
+    limit = min(limit, available)
+    if limit <= 0:
+        return []
+
+    # argpartition выбирает лучшие limit за O(n), сортируются только они
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top], kind='stable')]
+    return list(zip(matrix.ids[top].tolist(), scores[top].tolist()))
+
+
+def recommend_user_ids(viewer, limit=100, exclude_ids=None):
+    """Id лучших кандидатов для зрителя по убыванию оценки"""
+    return [pk for pk, _ in recommend(viewer, limit, exclude_ids)]
@@ -0,0 +1,118 @@
+"""
+Маршрутизация чтения на реплики.
+
+Запросы на чтение внутри HTTP-запроса уходят на реплику из
+settings.DATABASE_REPLICAS, запись - всегда на основную БД. После записи
+сессия "прилипает" к основной БД на REPLICA_STICKY_SECONDS, чтобы
+пользователь сразу видел свои изменения, несмотря на отставание реплик.
+Вне HTTP-запросов (команды, воркеры) все запросы идут на основную БД.
+"""
+import random
+import time
+from contextvars import ContextVar
+
+# noinspection PyUnresolvedReferences
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+# noinspection PyUnresolvedReferences
+from django.db import DEFAULT_DB_ALIAS, connections
+
+PIN_SESSION_KEY = '_db_pinned_until'
+# Приложения, которые всегда читаются с основной БД: сессию и вход
+# нужно видеть сразу после записи
+PRIMARY_ONLY_APPS = {'sessions'}
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    __slots__ = ('replica', 'pinned', 'wrote')
+
+    def __init__(self, replica, pinned):
+        self.replica = replica
+        self.pinned = pinned
+        self.wrote = False
+
+
+# Состояние текущего запроса; контекст копируется и в потоки sync_to_async
+current_routing = ContextVar('dating_db_routing', default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        state = current_routing.get()
+        if (
+            state is None
+            or state.pinned
+            or state.replica is None
+            or model._meta.app_label in PRIMARY_ONLY_APPS
+            # Чтение внутри транзакции должно видеть ее же изменения
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return state.replica
+
+    def db_for_write(self, model, **hints):
+        state = current_routing.get()
+        # Запись сессии (вход, выход) не меняет данные, которые читаются с реплик
+        if state is not None and model._meta.app_label not in PRIMARY_ONLY_APPS:
+            # До конца запроса и на окно после него читаем с основной БД
+            state.pinned = True
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики содержат те же данные, что и основная БД
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in getattr(settings, 'DATABASE_REPLICAS', ())
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Включает чтение с реплик на время запроса. Должен стоять после
+    SessionMiddleware: метка "прилипания" хранится в сессии.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = self.make_state(request, request.session.get(PIN_SESSION_KEY, 0))
+        token = current_routing.set(state)
+        try:
+            return self.get_response(request)
+        finally:
+            current_routing.reset(token)
+            if state.wrote:
+                request.session[PIN_SESSION_KEY] = self.pinned_until()
+
+    async def __acall__(self, request):
+        state = self.make_state(request, await request.session.aget(PIN_SESSION_KEY, 0))
+        token = current_routing.set(state)
+        try:
+            return await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+            if state.wrote:
+                await request.session.aset(PIN_SESSION_KEY, self.pinned_until())
+
+    @staticmethod
+    def make_state(request, pinned_until):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', ())
+        # Одна реплика на весь запрос - чтения согласованы между собой
+        replica = random.choice(replicas) if replicas else None
+        pinned = request.method not in SAFE_METHODS or pinned_until > time.time()
+        return RoutingState(replica, pinned)
+
+    @staticmethod
+    def pinned_until():
+        return time.time() + getattr(settings, 'REPLICA_STICKY_SECONDS', 10)
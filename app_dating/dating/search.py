@@ -0,0 +1,31 @@
+# noinspection PyUnresolvedReferences
+from django.contrib.postgres.search import SearchQuery, SearchRank
+# noinspection PyUnresolvedReferences
+from django.db import connections
+# noinspection PyUnresolvedReferences
+from django.db.models import F, Q
+
+# Конфигурация полнотекстового поиска PostgreSQL со стеммингом для русского языка
+SEARCH_CONFIG = 'russian'
+
+
+def search_users(queryset, query):
+    """
+    Полнотекстовый поиск по имени, фамилии, городу и увлечениям.
+
+    На PostgreSQL используется колонка search_vector (GIN-индекс, обновляется
+    триггером), результаты ранжируются по релевантности. На других БД
+    остается поиск через icontains.
+    """
+    if connections[queryset.db].vendor != 'postgresql':
+        return queryset.filter(
+            Q(first_name__icontains=query) |
+            Q(last_name__icontains=query) |
+            Q(city__icontains=query) |
+            Q(hobbies__icontains=query)
+        )
+
+    search_query = SearchQuery(query, config=SEARCH_CONFIG, search_type='websearch')
+    return queryset.filter(search_vector=search_query).annotate(
+        search_rank=SearchRank(F('search_vector'), search_query)
+    ).order_by('-search_rank', *queryset.query.order_by)
@@ -0,0 +1,112 @@
+import numpy as np
+# noinspection PyUnresolvedReferences
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+# noinspection PyUnresolvedReferences
+from django.core.cache.backends.dummy import DummyCache
+# noinspection PyUnresolvedReferences
+from django.core.cache.backends.locmem import LocMemCache
+from .metrics import record_cache
+from .models import UserInteraction
+
+# Фильтр Блума на 2**17 бит (16 КБ) и 4 хеш-функции: при 20 000 свайпов
+# доля ложных срабатываний около 4%, размер не зависит от числа свайпов
+SIZE_LOG2 = 17
+SIZE_BITS = 1 << SIZE_LOG2
+# Нечетные множители для мультипликативного хеширования (по одному на хеш-функцию)
+MULTIPLIERS = np.array([
+    0x9E3779B97F4A7C15,
+    0xC2B2AE3D27D4EB4F,
+    0x165667B19E3779F9,
+    0xD6E8FEB86659FD93,
+], dtype=np.uint64)
+
+SEEN_CACHE_TIMEOUT = 60 * 60 * 24 * 7
+
+
+def _cache_key(viewer_id):
+    return f'dating:seen:{viewer_id}'
+
+
+def is_shared_cache():
+    """
+    Кэш общий для всех воркеров. В кэше процесса (LocMemCache) свайп обновил бы
+    фильтр только в одном воркере, а остальные показывали бы оцененные анкеты
+    """
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+class SeenFilter:
+    """Компактное множество анкет, которые пользователь уже оценил"""
+
+    def __init__(self, data=None):
+        if data is None:
+            self.bits = np.zeros(SIZE_BITS // 8, dtype=np.uint8)
+        else:
+            self.bits = np.frombuffer(data, dtype=np.uint8).copy()
+
+    @staticmethod
+    def _positions(ids):
+        ids = np.asarray(ids, dtype=np.int64).astype(np.uint64)
+        # Старшие биты произведения - позиции в битовом массиве, shape (n, k)
+        return (ids[:, None] * MULTIPLIERS[None, :]) >> np.uint64(64 - SIZE_LOG2)
+
+    def add(self, ids):
+        positions = self._positions(ids).ravel()
+        np.bitwise_or.at(
+            self.bits,
+            (positions >> np.uint64(3)).astype(np.intp),
+            (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        )
+
+    def contains(self, ids):
+        """Булев массив: какие из ids уже видели (возможны редкие ложные срабатывания)"""
+        positions = self._positions(ids)
+        if not positions.size:
+            return np.zeros(0, dtype=bool)
+        bytes_ = self.bits[(positions >> np.uint64(3)).astype(np.intp)]
+        masks = np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)
+        return np.all(bytes_ & masks, axis=1)
+
+    def __contains__(self, pk):
+        return bool(self.contains([pk])[0])
+
+    def to_bytes(self):
+        return self.bits.tobytes()
+
+
+def build_seen_filter(viewer_id):
+    """Собирает фильтр по таблице взаимодействий (при промахе или без общего кэша)"""
+    seen = SeenFilter()
+    seen.add(list(
+        UserInteraction.objects.filter(
+            from_user_id=viewer_id,
+            interaction_type__in=('like', 'dislike')
+        ).values_list('to_user_id', flat=True)
+    ))
+    if is_shared_cache():
+        cache.set(_cache_key(viewer_id), seen.to_bytes(), SEEN_CACHE_TIMEOUT)
+    return seen
+
+
+def get_seen_filter(viewer_id):
+    if not is_shared_cache():
+        # Без общего кэша фильтр каждый раз строится по БД - всегда актуален
+        return build_seen_filter(viewer_id)
+    data = cache.get(_cache_key(viewer_id))
+    record_cache('seen_filter', data is not None)
+    if data is None:
+        return build_seen_filter(viewer_id)
+    return SeenFilter(data)
+
+
+def mark_seen(viewer_id, ids):
+    """Добавляет оцененные анкеты в фильтр зрителя"""
+    if not is_shared_cache():
+        return
+    data = cache.get(_cache_key(viewer_id))
+    if data is None:
+        # Фильтр соберется из БД целиком при следующем чтении
+        return
+    seen = SeenFilter(data)
+    seen.add(ids)
+    cache.set(_cache_key(viewer_id), seen.to_bytes(), SEEN_CACHE_TIMEOUT)
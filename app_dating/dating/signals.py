@@ -0,0 +1,68 @@
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.db.models.signals import post_init, post_save, post_delete
+# noinspection PyUnresolvedReferences
+from django.dispatch import receiver
+from .facets import FACET_FIELDS, invalidate_facets
+from .models import User, UserInteraction, UserPhoto
+from .profile_cache import invalidate_profile, touch_profile
+from .queues import QUEUE_FIELDS, mark_stale, remove_candidate, remove_from_queue
+
+# Поля, исходные значения которых запоминаются при загрузке пользователя
+TRACKED_FIELDS = tuple(dict.fromkeys(FACET_FIELDS + QUEUE_FIELDS))
+
+
+def _snapshot(instance):
+    return {field: instance.__dict__.get(field) for field in TRACKED_FIELDS}
+
+
+def _changed(instance, fields):
+    current = _snapshot(instance)
+    return any(instance._tracked_state[field] != current[field] for field in fields)
+
+
+@receiver(post_init, sender=User)
+def remember_tracked_state(sender, instance, **kwargs):
+    """Запоминаем исходные значения полей, чтобы сравнить их после сохранения"""
+    instance._tracked_state = _snapshot(instance)
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created or _changed(instance, FACET_FIELDS):
+        transaction.on_commit(invalidate_facets)
+
+    if created:
+        # Новая анкета попадет в очереди зрителей своего города при ближайшем
+        # запуске refresh_candidate_queues; флаг пишется в той же транзакции
+        mark_stale(instance.pk, fan_out=True)
+    elif _changed(instance, QUEUE_FIELDS):
+        # Изменились предпочтения самого пользователя - его очередь пересчитается.
+        # Оценка анкеты в чужих очередях устарела (или она сменила город):
+        # убираем ее отовсюду, а в очереди подходящих зрителей она вернется в фоне
+        mark_stale(instance.pk, fan_out=True)
+        remove_candidate(instance.pk)
+
+    # updated_at изменился - кэшированная карточка профиля устарела
+    invalidate_profile(instance.pk)
+    instance._tracked_state = _snapshot(instance)
+
+
+@receiver(post_delete, sender=User)
+def user_deleted(sender, instance, **kwargs):
+    transaction.on_commit(invalidate_facets)
+    invalidate_profile(instance.pk)
+
+
+@receiver(post_save, sender=UserPhoto)
+@receiver(post_delete, sender=UserPhoto)
+def photo_changed(sender, instance, **kwargs):
+    """Загрузка, удаление и смена главного фото меняют публичный профиль"""
+    touch_profile(instance.user_id)
+
+
+@receiver(post_save, sender=UserInteraction)
+def interaction_saved(sender, instance, **kwargs):
+    if instance.interaction_type in ('like', 'dislike'):
+        remove_from_queue(instance.from_user_id, [instance.to_user_id])
@@ -0,0 +1,73 @@
+import logging
+from datetime import timedelta
+
+# noinspection PyUnresolvedReferences
+from django.db import transaction
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
+from .images import generate_photo_variants
+from .models import UserPhoto
+from .profile_cache import touch_profile
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 5
+# Задержка перед повтором: 30 с, 1 мин, 2 мин, 4 мин...
+RETRY_BASE_DELAY = timedelta(seconds=30)
+# Сколько фото "принадлежит" воркеру; если он упал, фото снова станет доступно
+CLAIM_TIMEOUT = timedelta(minutes=5)
+
+
+def claim_pending_photos(limit):
+    """
+    Забирает из очереди до limit фото, готовых к обработке.
+
+    SKIP LOCKED позволяет запускать несколько воркеров параллельно, а сдвиг
+    process_after работает как аренда: фото упавшего воркера вернется в очередь.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        photos = list(
+            UserPhoto.objects.select_for_update(skip_locked=True).filter(
+                processing_state='pending',
+                process_after__lte=now
+            ).order_by('process_after')[:limit]
+        )
+        UserPhoto.objects.filter(pk__in=[photo.pk for photo in photos]).update(
+            process_after=now + CLAIM_TIMEOUT
+        )
+    return photos
+
+
+def process_photo(photo):
+    """Обрабатывает одно фото и записывает результат; при ошибке планирует повтор"""
+    try:
+        generate_photo_variants(photo)
+    except Exception as exc:
+        attempts = photo.processing_attempts + 1
+        failed = attempts >= MAX_ATTEMPTS
+        logger.warning('Ошибка обработки фото #%s (попытка %s): %s', photo.pk, attempts, exc)
+        UserPhoto.objects.filter(pk=photo.pk).update(
+            processing_state='failed' if failed else 'pending',
+            processing_attempts=attempts,
+            process_after=timezone.now() + RETRY_BASE_DELAY * 2 ** (attempts - 1),
+            processing_error=str(exc)
+        )
+        return False
+
+    # Готовые копии меняют srcset на странице профиля
+    touch_profile(photo.user_id)
+    UserPhoto.objects.filter(pk=photo.pk).update(
+        processing_state='ready',
+        processing_attempts=photo.processing_attempts + 1,
+        processing_error=''
+    )
+    return True
+
+
+def run_pending_photos(limit=20):
+    """Один проход воркера. Возвращает количество обработанных фото"""
+    photos = claim_pending_photos(limit)
+    for photo in photos:
+        process_photo(photo)
+    return len(photos)
@@ -1,3 +1,1191 @@
-from django.test import TestCase
+import asyncio
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import BytesIO, StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from PIL import Image
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import IntegrityError, connection, models, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from .benchmarks import compare, run_benchmarks
+from .facets import get_facets
+from .geo import covering_cells, encode_geohash
+from .hobbies import hobby_mask
+from .interactions import record_swipe
+from .metrics import CACHE_REQUESTS, REQUEST_QUERIES, SLOW_QUERIES, reset_metrics
+from .models import (
+    City, User, UserPhoto, UserInteraction, Match, CandidateQueue, CandidateQueueEntry, ProfileView,
+    ProfileViewer,
+)
+from .notifications import InProcessBroker, format_sse
+from .partitions import (
+    DEFAULT_PARTITION, existing_partitions, month_start, partition_bounds, partition_name, planned_partitions,
+)
+from .queues import candidate_ids, fan_out_pending, refresh_queue
+from .recommendations import MATRIX_TTL, clear_candidate_cache, get_candidate_matrix, recommend_user_ids
+from .routers import ReplicaRouter, ReplicaRoutingMiddleware
+from .seen import SeenFilter, get_seen_filter
+from .tasks import MAX_ATTEMPTS, run_pending_photos
+from .view_tracking import buffer as view_buffer, flush_if_due, flush_on_exit, flush_views
+from .views import FILTER_PARAMS, filter_feed
+
+
+def create_user(index, **kwargs):
+    """Создает активного пользователя с минимально нужными полями"""
+    data = {
+        'username': f'user{index}',
+        'email': f'user{index}@example.com',
+        'first_name': f'Имя{index}',
+        'last_name': f'Фамилия{index}',
+        'gender': 'M' if index % 2 else 'F',
+        'age': 20 + index % 30,
+        'city': 'Москва',
+    }
+    data.update(kwargs)
+    return User.objects.create(**data)
+
+
+class HomeViewQueriesTest(TestCase):
+    """Количество запросов главной страницы не должно зависеть от числа карточек"""
+
+    def _create_users_with_photos(self, count, start=0):
+        for index in range(start, start + count):
+            user = create_user(index)
+            UserPhoto.objects.create(user=user, photo=f'user_photos/{index}.jpg', is_main=True)
+            UserPhoto.objects.create(user=user, photo=f'user_photos/{index}_2.jpg')
+
+    def _count_home_queries(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('home'))
+        self.assertEqual(response.status_code, 200)
+        return len(context.captured_queries)
+
+    def test_query_count_does_not_grow_with_page_size(self):
+        self._create_users_with_photos(2)
+        small_page = self._count_home_queries()
+
+        self._create_users_with_photos(8, start=2)
+        full_page = self._count_home_queries()
+
+        self.assertEqual(small_page, full_page)
+
+    def test_main_photo_is_attached_to_cards(self):
+        self._create_users_with_photos(3)
+        create_user(100)
+
+        response = self.client.get(reverse('home'))
+
+        users = {user.email: user for user in response.context['users']}
+        self.assertEqual(users['user1@example.com'].main_photo.photo.name, 'user_photos/1.jpg')
+        self.assertIsNone(users['user100@example.com'].main_photo)
+
+
+class HomeSearchTest(TestCase):
+    def test_search_filters_by_hobbies(self):
+        create_user(1, hobbies='Люблю путешествовать')
+        create_user(2, hobbies='Шахматы')
+
+        response = self.client.get(reverse('home'), {'search': 'путешествовать'})
+
+        emails = [user.email for user in response.context['users']]
+        self.assertEqual(emails, ['user1@example.com'])
+
+
+class HomeCursorPaginationTest(TestCase):
+    def test_cursor_walks_whole_feed_without_duplicates(self):
+        for index in range(25):
+            create_user(index)
+
+        seen = []
+        cursor = None
+        while True:
+            params = {'cursor': cursor} if cursor else {}
+            response = self.client.get(reverse('home'), params)
+            page = response.context['users']
+            seen.extend(user.id for user in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        expected = list(User.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        create_user(1)
+
+        response = self.client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+
+        self.assertEqual(len(response.context['users']), 1)
+
+    def test_cursor_continues_past_fully_swiped_batches(self):
+        cache.clear()
+        viewer = create_user(0, gender='M')
+        profiles = [create_user(index, gender='F') for index in range(1, 131)]
+        # Самые новые 120 анкет зритель уже оценил - больше, чем читается за запрос
+        UserInteraction.objects.bulk_create(
+            UserInteraction(from_user=viewer, to_user=profile, interaction_type='dislike')
+            for profile in profiles[10:]
+        )
+        self.client.force_login(viewer)
+
+        shown, cursor = [], None
+        for _ in range(5):
+            params = {'gender': 'F', **({'cursor': cursor} if cursor else {})}
+            page = self.client.get(reverse('home'), params).context['users']
+            shown.extend(user.id for user in page)
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+
+        self.assertEqual(sorted(shown), sorted(profile.id for profile in profiles[:10]))
+
+
+class FacetsCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_facets_are_served_from_cache(self):
+        create_user(1, city='Казань')
+        get_facets()
+
+        with self.assertNumQueries(0):
+            facets = get_facets()
+
+        self.assertEqual(facets['cities'], ['Казань'])
+        self.assertEqual(facets['genders'], {'M': 1})
+
+    def test_city_change_invalidates_facets(self):
+        user = create_user(1, city='Казань')
+        get_facets()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.city = 'Самара'
+            user.save()
+
+        self.assertEqual(get_facets()['cities'], ['Самара'])
+
+    def test_unrelated_change_keeps_facets(self):
+        user = create_user(1, city='Казань')
+        get_facets()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            user.hobbies = 'Книги'
+            user.save()
+
+        # Сбрасывается только карточка профиля, фильтры остаются в кэше
+        with self.assertNumQueries(0):
+            self.assertEqual(get_facets()['cities'], ['Казань'])
+
+
+class LikesCountTest(TestCase):
+    def setUp(self):
+        self.viewer = create_user(1)
+        self.target = create_user(2)
+        self.client.force_login(self.viewer)
+
+    def _interact(self, action):
+        self.client.get(reverse('interact_user', args=[action, self.target.id]))
+        self.target.refresh_from_db()
+        return self.target.likes_count
+
+    def test_like_increments_once(self):
+        self.assertEqual(self._interact('like'), 1)
+        self.assertEqual(self._interact('like'), 1)
+
+    def test_dislike_replacing_like_decrements(self):
+        self._interact('like')
+
+        self.assertEqual(self._interact('dislike'), 0)
+        self.assertEqual(
+            list(UserInteraction.objects.values_list('interaction_type', flat=True)),
+            ['dislike']
+        )
+
+    def test_rebuild_command_recounts_from_interactions(self):
+        UserInteraction.objects.create(from_user=self.viewer, to_user=self.target, interaction_type='like')
+        User.objects.filter(pk=self.viewer.pk).update(likes_count=5)
+
+        call_command('rebuild_likes_count', batch_size=1, stdout=StringIO())
+
+        self.assertEqual(
+            dict(User.objects.values_list('id', 'likes_count')),
+            {self.viewer.id: 0, self.target.id: 1}
+        )
+
+
+class MatchEngineTest(TestCase):
+    def setUp(self):
+        self.first = create_user(1)
+        self.second = create_user(2)
+
+    def _like(self, from_user, to_user):
+        self.client.force_login(from_user)
+        self.client.get(reverse('interact_user', args=['like', to_user.id]))
+
+    def test_mutual_like_creates_single_match(self):
+        self._like(self.first, self.second)
+        self.assertFalse(Match.objects.exists())
+
+        self._like(self.second, self.first)
+        self._like(self.second, self.first)
+
+        match = Match.objects.get()
+        self.assertEqual(set(match.users.values_list('id', flat=True)), {self.first.id, self.second.id})
+
+    def test_backfill_creates_matches_for_existing_pairs(self):
+        third = create_user(3)
+        for from_user, to_user in [(self.first, self.second), (self.second, self.first), (self.first, third)]:
+            UserInteraction.objects.create(from_user=from_user, to_user=to_user, interaction_type='like')
+
+        call_command('backfill_matches', stdout=StringIO())
+        call_command('backfill_matches', stdout=StringIO())
+
+        match = Match.objects.get()
+        self.assertEqual(set(match.users.values_list('id', flat=True)), {self.first.id, self.second.id})
+
+
+def make_jpeg(width, height):
+    """JPEG с EXIF-данными для проверки обработки загрузок"""
+    exif = Image.Exif()
+    exif[0x010F] = 'TestCamera'
+    buffer = BytesIO()
+    Image.new('RGB', (width, height), 'red').save(buffer, 'JPEG', exif=exif)
+    return buffer.getvalue()
+
+
+class PhotoVariantsTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+        self.user = create_user(1)
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_upload_creates_resized_webp_variants_without_exif(self):
+        upload = SimpleUploadedFile('big.jpg', make_jpeg(3840, 2160), content_type='image/jpeg')
+
+        self.client.post(reverse('upload_photo'), {'photo': upload, 'is_main': 'on'})
+        self.assertEqual(UserPhoto.objects.get().processing_state, 'pending')
+
+        self.assertEqual(run_pending_photos(), 1)
+
+        photo = UserPhoto.objects.get()
+        self.assertTrue(photo.is_main)
+        self.assertEqual(photo.processing_state, 'ready')
+        for field_name, width in (('thumbnail', 160), ('card', 480), ('full', 1280)):
+            with Image.open(getattr(photo, field_name).path) as image:
+                self.assertEqual(image.format, 'WEBP')
+                self.assertEqual(image.width, width)
+                self.assertNotIn('exif', image.info)
+        self.assertIn(' 480w', photo.srcset)
+
+    def test_broken_file_is_retried_with_backoff_then_failed(self):
+        photo = UserPhoto.objects.create(user=self.user, photo='user_photos/missing.jpg')
+
+        with self.assertLogs('dating.tasks', level='WARNING'):
+            self.assertEqual(run_pending_photos(), 1)
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_state, 'pending')
+        self.assertEqual(photo.processing_attempts, 1)
+        # Повтор запланирован на будущее, поэтому сразу фото не берется
+        self.assertEqual(run_pending_photos(), 0)
+
+        UserPhoto.objects.filter(pk=photo.pk).update(processing_attempts=MAX_ATTEMPTS - 1, process_after=photo.uploaded_at)
+        with self.assertLogs('dating.tasks', level='WARNING'):
+            run_pending_photos()
+        photo.refresh_from_db()
+        self.assertEqual(photo.processing_state, 'failed')
+
+
+class RecommendationsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_candidate_cache()
+        self.viewer = create_user(1, gender='M', age=30, hobbies='Путешествия и книги')
+
+    def test_compatible_profiles_rank_first(self):
+        best = create_user(2, gender='F', age=29, hobbies='Люблю путешествовать')
+        same_gender = create_user(3, gender='M', age=30, hobbies='Путешествия')
+        far_age = create_user(4, gender='F', age=60, hobbies='Рыбалка')
+        create_user(5, gender='F', age=30, city='Казань')
+
+        ranked = recommend_user_ids(self.viewer)
+
+        self.assertEqual(ranked[0], best.id)
+        self.assertEqual(set(ranked), {best.id, same_gender.id, far_age.id})
+
+    def test_swiped_profiles_are_excluded_from_home(self):
+        liked = create_user(2, gender='F', age=30)
+        fresh = create_user(3, gender='F', age=31)
+        UserInteraction.objects.create(from_user=self.viewer, to_user=liked, interaction_type='like')
+        self.client.force_login(self.viewer)
+
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual([user.id for user in response.context['users']], [fresh.id])
+
+    def test_matrix_uses_stored_hobby_mask(self):
+        self.viewer.hobbies = 'Шахматы, путешествия'
+        self.viewer.save(update_fields=['hobbies'])
+
+        matrix = get_candidate_matrix('Москва')
+
+        self.assertEqual(int(matrix.hobbies[matrix.ids == self.viewer.id][0]), hobby_mask(self.viewer.hobbies))
+
+    def test_stale_matrix_is_served_while_rebuilding(self):
+        matrix = get_candidate_matrix('Москва')
+        matrix.built_at -= MATRIX_TTL + 1
+
+        with mock.patch('dating.recommendations.schedule_rebuild') as schedule:
+            self.assertIs(get_candidate_matrix('Москва'), matrix)
+
+        schedule.assert_called_once()
+
+
+class CandidateQueueTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_candidate_cache()
+        self.viewer = create_user(1, gender='M', age=30)
+        self.first = create_user(2, gender='F', age=30)
+        self.second = create_user(3, gender='F', age=45)
+        call_command('refresh_candidate_queues', stdout=StringIO())
+
+    def _queue(self):
+        return list(
+            CandidateQueueEntry.objects.filter(viewer=self.viewer).order_by('-score').values_list('candidate_id', flat=True)
+        )
+
+    def test_refresh_fills_ranked_queue(self):
+        self.assertEqual(self._queue(), [self.first.id, self.second.id])
+        self.assertFalse(CandidateQueue.objects.filter(is_stale=True).exists())
+
+    def test_home_serves_queue(self):
+        self.client.force_login(self.viewer)
+
+        response = self.client.get(reverse('home'))
+
+        self.assertEqual([user.id for user in response.context['users']], [self.first.id, self.second.id])
+
+    def test_new_user_is_inserted_into_existing_queues(self):
+        newcomer = create_user(4, gender='F', age=31)
+        # Сохранение профиля только ставит отметку - очереди дополняются в фоне
+        self.assertEqual(self._queue(), [self.first.id, self.second.id])
+
+        call_command('refresh_candidate_queues', stdout=StringIO())
+
+        self.assertEqual(candidate_ids(self.viewer), [self.first.id, newcomer.id, self.second.id])
+        self.assertFalse(CandidateQueue.objects.filter(needs_fan_out=True).exists())
+        # В очередь другого города анкета не попадает
+        self.assertFalse(CandidateQueueEntry.objects.filter(candidate=newcomer).exclude(
+            viewer__city='Москва'
+        ).exists())
+
+    def test_moved_and_reactivated_users_reach_queues(self):
+        moved = create_user(4, gender='F', age=31, city='Казань')
+        inactive = create_user(5, gender='F', age=29, is_active=False)
+        self.assertEqual(self._queue(), [self.first.id, self.second.id])
+
+        moved.city = 'Москва'
+        moved.save()
+        inactive.is_active = True
+        inactive.save()
+        fan_out_pending()
+
+        self.assertEqual(set(self._queue()), {self.first.id, self.second.id, moved.id, inactive.id})
+
+    def test_full_queue_only_accepts_better_candidates(self):
+        self.viewer.hobbies = 'Теннис'
+        self.viewer.save()
+        refresh_queue(self.viewer, size=1)
+
+        create_user(4, gender='F', age=50)
+        fan_out_pending()
+        self.assertEqual(self._queue(), [self.first.id])
+        better = create_user(5, gender='F', age=30, hobbies='Теннис', status='looking')
+        fan_out_pending()
+        self.assertIn(better.id, self._queue())
+
+    def test_rolled_back_registration_leaves_no_queue_rows(self):
+        with transaction.atomic():
+            create_user(4, gender='F', age=31)
+            transaction.set_rollback(True)
+
+        self.assertEqual(fan_out_pending(), 0)
+        self.assertEqual(self._queue(), [self.first.id, self.second.id])
+
+    def test_interaction_removes_candidate_from_queue(self):
+        UserInteraction.objects.create(from_user=self.viewer, to_user=self.first, interaction_type='dislike')
+
+        self.assertEqual(self._queue(), [self.second.id])
+
+    def test_profile_change_marks_queue_stale_and_moves_candidate(self):
+        self.first.city = 'Казань'
+        self.first.save()
+
+        self.assertEqual(self._queue(), [self.second.id])
+        self.assertTrue(CandidateQueue.objects.get(user=self.first).is_stale)
+        self.assertFalse(CandidateQueue.objects.get(user=self.viewer).is_stale)
+
+
+class SeenFilterTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.viewer = create_user(1)
+
+    def test_filter_keeps_added_ids_and_survives_serialization(self):
+        seen = SeenFilter()
+        seen.add([10, 20, 30])
+
+        restored = SeenFilter(seen.to_bytes())
+
+        self.assertEqual(list(restored.contains([10, 20, 30])), [True, True, True])
+        self.assertNotIn(11, restored)
+
+    @mock.patch('dating.seen.is_shared_cache', return_value=True)
+    def test_swipe_updates_cached_filter(self, shared):
+        target = create_user(2)
+        get_seen_filter(self.viewer.id)
+        self.client.force_login(self.viewer)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('interact_user', args=['like', target.id]))
+
+        with self.assertNumQueries(0):
+            self.assertIn(target.id, get_seen_filter(self.viewer.id))
+
+    def test_process_local_cache_reads_filter_from_db(self):
+        target = create_user(2)
+        get_seen_filter(self.viewer.id)
+        # Свайп, обработанный другим воркером: локальный кэш этого процесса о нем не знает
+        UserInteraction.objects.create(from_user=self.viewer, to_user=target, interaction_type='like')
+        cache.set(f'dating:seen:{self.viewer.id}', SeenFilter().to_bytes())
+
+        self.assertIn(target.id, get_seen_filter(self.viewer.id))
+
+    def test_filtered_feed_skips_swiped_profiles(self):
+        for index in range(2, 30):
+            user = create_user(index)
+            if index % 3:
+                UserInteraction.objects.create(from_user=self.viewer, to_user=user, interaction_type='dislike')
+        self.client.force_login(self.viewer)
+
+        response = self.client.get(reverse('home'), {'city': 'Москва'})
+
+        expected = list(
+            User.objects.exclude(received_interactions__from_user=self.viewer).order_by('-created_at', '-id').values_list('id', flat=True)[:10]
+        )
+        self.assertEqual([user.id for user in response.context['users']], expected)
+
+
+class SwipeApiTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        clear_candidate_cache()
+        self.viewer = create_user(1, gender='M')
+        self.first = create_user(2, gender='F')
+        self.second = create_user(3, gender='F')
+        self.client.force_login(self.viewer)
+
+    def _post(self, swipes):
+        return self.client.post(
+            reverse('api_interactions'),
+            json.dumps({'swipes': swipes}),
+            content_type='application/json'
+        )
+
+    def test_batch_saves_swipes_counters_and_matches(self):
+        UserInteraction.objects.create(from_user=self.second, to_user=self.viewer, interaction_type='like')
+
+        response = self._post([
+            {'user_id': self.first.id, 'action': 'like'},
+            {'user_id': self.second.id, 'action': 'like'},
+            {'user_id': 999, 'action': 'like'},
+        ])
+
+        self.assertEqual(response.json(), {'saved': 2, 'matches': [self.second.id], 'unknown_users': [999]})
+        self.assertEqual(
+            dict(User.objects.filter(pk__in=[self.first.id, self.second.id]).values_list('id', 'likes_count')),
+            {self.first.id: 1, self.second.id: 1}
+        )
+        self.assertEqual(Match.objects.count(), 1)
+
+    def test_dislike_replaces_like(self):
+        self._post([{'user_id': self.first.id, 'action': 'like'}])
+
+        response = self._post([{'user_id': self.first.id, 'action': 'dislike'}])
+
+        self.assertEqual(response.json()['saved'], 1)
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.likes_count, 0)
+        self.assertEqual(
+            list(UserInteraction.objects.filter(from_user=self.viewer).values_list('interaction_type', flat=True)),
+            ['dislike']
+        )
+
+    def test_invalid_action_is_rejected(self):
+        response = self._post([{'user_id': self.first.id, 'action': 'superlike'}])
+
+        self.assertEqual(response.status_code, 400)
+
+    def test_feed_requires_login_and_returns_candidates(self):
+        self._post([{'user_id': self.first.id, 'action': 'dislike'}])
+
+        response = self.client.get(reverse('api_feed'))
+        self.client.logout()
+
+        self.assertEqual([user['id'] for user in response.json()['results']], [self.second.id])
+        self.assertEqual(self.client.get(reverse('api_feed')).status_code, 401)
+
+    def test_feed_rejects_non_positive_limit(self):
+        for limit in ('-5', '0', 'abc'):
+            self.assertEqual(self.client.get(reverse('api_feed'), {'limit': limit}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('api_feed'), {'limit': 1}).status_code, 200)
+
+
+class AsyncViewsTest(TestCase):
+    async def test_user_detail_under_async_client(self):
+        viewer = await User.objects.acreate(
+            username='viewer', email='viewer@example.com', first_name='Анна',
+            last_name='Иванова', gender='F', age=25, city='Москва'
+        )
+        profile = await User.objects.acreate(
+            username='profile', email='profile@example.com', first_name='Иван',
+            last_name='Петров', gender='M', age=27, city='Москва'
+        )
+        await UserPhoto.objects.acreate(user=profile, photo='user_photos/main.jpg', is_main=True)
+        await self.async_client.aforce_login(viewer)
+
+        response = await self.async_client.get(reverse('user_detail', args=[profile.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['main_photo'].photo.name, 'user_photos/main.jpg')
+
+
+class NotificationsTest(TestCase):
+    def setUp(self):
+        self.broker = InProcessBroker()
+        patcher = mock.patch('dating.notifications.get_broker', return_value=self.broker)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def test_subscriber_receives_published_event(self):
+        queue = self.broker.subscribe(7)
+
+        self.broker.publish(7, {'type': 'like', 'user_id': 1})
+        self.broker.publish(8, {'type': 'like', 'user_id': 2})
+
+        event = await asyncio.wait_for(queue.get(), 1)
+        self.assertEqual(event, {'type': 'like', 'user_id': 1})
+        self.assertTrue(queue.empty())
+        self.assertEqual(format_sse(event), 'event: like\ndata: {"type": "like", "user_id": 1}\n\n')
+
+    def test_like_and_match_are_published_after_commit(self):
+        first = create_user(1)
+        second = create_user(2)
+        published = []
+        self.broker.publish = lambda user_id, event: published.append((user_id, event['type']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            record_swipe(first, second, 'like')
+        with self.captureOnCommitCallbacks(execute=True):
+            record_swipe(second, first, 'like')
+
+        self.assertEqual(published, [
+            (second.id, 'like'),
+            (first.id, 'like'),
+            (second.id, 'match'),
+            (first.id, 'match'),
+        ])
+
+    def test_stream_requires_asgi(self):
+        self.client.force_login(create_user(1))
+
+        response = self.client.get(reverse('api_notifications'))
+
+        self.assertEqual(response.status_code, 501)
+        self.assertNotContains(self.client.get(reverse('profile')), 'EventSource')
+        with override_settings(NOTIFICATIONS_STREAM=True):
+            self.assertContains(self.client.get(reverse('profile')), 'EventSource')
+
+
+class ProfileCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        # Просмотры прошлых тестов не должны записаться посреди подсчета запросов
+        view_buffer.drain()
+        self.viewer = create_user(1)
+        self.profile = create_user(2, hobbies='Теннис')
+        self.first_photo = UserPhoto.objects.create(user=self.profile, photo='user_photos/first.jpg', is_main=True)
+        self.second_photo = UserPhoto.objects.create(user=self.profile, photo='user_photos/second.jpg')
+        self.client.force_login(self.viewer)
+        self.url = reverse('user_detail', args=[self.profile.id])
+
+    def test_cache_hit_only_queries_session_and_user(self):
+        self.client.get(self.url)
+
+        # Сессия и пользователь из AuthenticationMiddleware
+        with self.assertNumQueries(2):
+            response = self.client.get(self.url)
+
+        self.assertContains(response, 'Теннис')
+
+    def test_set_main_photo_invalidates_profile(self):
+        self.client.get(self.url)
+        self.client.force_login(self.profile)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.get(reverse('set_main_photo', args=[self.second_photo.id]))
+        self.client.force_login(self.viewer)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.context['main_photo'], self.second_photo)
+
+    def test_profile_edit_invalidates_profile(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.hobbies = 'Шахматы'
+            self.profile.save()
+
+        self.assertContains(self.client.get(self.url), 'Шахматы')
+
+    def test_photo_change_invalidates_profile_after_commit(self):
+        self.client.get(self.url)
+
+        with self.captureOnCommitCallbacks() as callbacks:
+            UserPhoto.objects.create(user=self.profile, photo='user_photos/third.jpg')
+            # До коммита кэшированная карточка еще действует
+            self.assertNotContains(self.client.get(self.url), 'third.jpg')
+        for callback in callbacks:
+            callback()
+
+        self.assertContains(self.client.get(self.url), 'third.jpg')
+
+    def test_inactive_profile_is_not_found(self):
+        User.objects.filter(pk=self.profile.pk).update(is_active=False)
+
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class MainPhotoTest(TestCase):
+    def setUp(self):
+        self.user = create_user(1)
+        self.first = UserPhoto.objects.create(user=self.user, photo='user_photos/first.jpg', is_main=True)
+        self.second = UserPhoto.objects.create(user=self.user, photo='user_photos/second.jpg')
+
+    def test_set_main_swaps_flag_and_cached_link(self):
+        self.assertTrue(UserPhoto.set_main(self.user.id, self.second.id))
+
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.main_photo_id, self.second.id)
+        self.assertEqual(
+            list(UserPhoto.objects.filter(is_main=True).values_list('id', flat=True)),
+            [self.second.id]
+        )
+
+    def test_set_main_rejects_foreign_photo(self):
+        other = create_user(2)
+
+        self.assertFalse(UserPhoto.set_main(other.id, self.second.id))
+        self.assertTrue(UserPhoto.objects.get(pk=self.first.id).is_main)
+
+    def test_constraint_forbids_second_main_photo(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UserPhoto.objects.filter(pk=self.second.pk).update(is_main=True)
+
+    def test_deleting_main_photo_clears_link(self):
+        self.first.delete()
+
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.main_photo)
+
+
+class SeedDatingTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def test_generates_consistent_dataset(self):
+        call_command(
+            'seed_dating', users=60, interactions=900, batch_size=100, seed=7, stdout=StringIO()
+        )
+
+        self.assertEqual(User.objects.count(), 60)
+        self.assertEqual(UserPhoto.objects.filter(is_main=True).count(), 60)
+        self.assertFalse(User.objects.filter(main_photo__isnull=True).exists())
+        self.assertGreater(UserInteraction.objects.count(), 500)
+        self.assertFalse(UserInteraction.objects.filter(from_user=models.F('to_user')).exists())
+
+        # Счетчики лайков и мэтчи пересчитаны после загрузки
+        likes = UserInteraction.objects.filter(interaction_type='like')
+        top = User.objects.order_by('-likes_count').first()
+        self.assertEqual(top.likes_count, likes.filter(to_user=top).count())
+        self.assertTrue(Match.objects.exists())
+
+
+class BenchmarkTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        view_buffer.drain()
+        clear_candidate_cache()
+        self.viewer = create_user(0)
+        self.add_users(1, 6)
+
+    @staticmethod
+    def add_users(start, stop):
+        for index in range(start, stop):
+            user = create_user(index, gender='F', age=30)
+            UserPhoto.objects.create(user=user, photo=f'user_photos/{index}.jpg', is_main=True)
+
+    def run_feed(self):
+        targets = list(User.objects.exclude(pk=self.viewer.pk).values_list('id', flat=True))
+        return run_benchmarks(self.viewer, targets, iterations=3, warmup=1, only=['home_filtered', 'user_detail'])
+
+    def test_benchmark_leaves_no_profile_views(self):
+        self.run_feed()
+
+        self.assertFalse(view_buffer.drain())
+        flush_views()
+        self.assertFalse(ProfileView.objects.exists())
+        self.assertFalse(User.objects.filter(views_count__gt=0).exists())
+
+    def test_feed_query_budget_does_not_grow_with_cards(self):
+        before = self.run_feed()
+        self.add_users(6, 16)
+        after = self.run_feed()
+
+        self.assertEqual(after['home_filtered']['queries'], before['home_filtered']['queries'])
+        self.assertEqual(set(after['user_detail']), {'p50_ms', 'p99_ms', 'queries', 'sql_ms'})
+
+    def test_compare_reports_regressions(self):
+        baseline = {'home': {'p50_ms': 10, 'p99_ms': 20, 'queries': 5, 'sql_ms': 2}}
+
+        self.assertEqual(compare({'home': {'p50_ms': 12, 'p99_ms': 21, 'queries': 5, 'sql_ms': 2}}, baseline), [])
+        regressions = compare({'home': {'p50_ms': 30, 'p99_ms': 20, 'queries': 15, 'sql_ms': 2}}, baseline)
+        self.assertEqual(len(regressions), 2)
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        reset_metrics()
+        self.user = create_user(1)
+        self.client.force_login(self.user)
+
+    def test_records_view_timing_queries_and_cache_hits(self):
+        self.client.get(reverse('home'), {'gender': 'F'})
+        self.client.get(reverse('home'), {'gender': 'F'})
+
+        self.assertEqual(REQUEST_QUERIES._series[('home',)][-1], 2)
+        self.assertGreater(REQUEST_QUERIES._series[('home',)][-2], 0)
+        self.assertEqual(CACHE_REQUESTS.value(('facets', 'miss')), 1)
+        self.assertEqual(CACHE_REQUESTS.value(('facets', 'hit')), 1)
+
+        body = self.client.get('/metrics').content.decode()
+        self.assertIn('dating_request_duration_seconds_count{view="home",method="GET"} 2', body)
+        self.assertIn('dating_responses_total{view="home",status="200"} 2', body)
+
+    @override_settings(METRICS_SLOW_QUERY_MS=0, METRICS_SLOW_QUERY_SAMPLE_RATE=1.0)
+    def test_slow_queries_are_logged_with_view_name(self):
+        with self.assertLogs('dating.slow_queries', level='WARNING') as logs:
+            self.client.get(reverse('profile'))
+
+        self.assertTrue(any('(profile)' in line for line in logs.output))
+        self.assertGreater(SLOW_QUERIES.value(('profile',)), 0)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_metrics_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+class ProductionSettingsTest(TestCase):
+    SCRIPT = (
+        'import json, app_dating.settings as s; '
+        'print(json.dumps({"debug": s.DEBUG, "apps": s.INSTALLED_APPS, "db": s.DATABASES["default"], '
+        '"session": getattr(s, "SESSION_ENGINE", None), '
+        '"loaders": s.TEMPLATES[0]["OPTIONS"].get("loaders")}, default=str))'
+    )
+
+    @staticmethod
+    def load_settings(**env):
+        """Импортирует app_dating.settings в отдельном процессе с заданным окружением"""
+        environ = {key: value for key, value in os.environ.items() if key not in ('DJANGO_ENV', 'DJANGO_SECRET_KEY')}
+        return subprocess.run(
+            [sys.executable, '-c', ProductionSettingsTest.SCRIPT],
+            cwd=settings.BASE_DIR,
+            env={**environ, **env},
+            capture_output=True,
+            text=True,
+        )
+
+    def test_production_profile(self):
+        config = json.loads(self.load_settings(DJANGO_ENV='production', DJANGO_SECRET_KEY='test').stdout)
+
+        self.assertFalse(config['debug'])
+        self.assertNotIn('debug_toolbar', config['apps'])
+        self.assertEqual(config['db']['CONN_MAX_AGE'], 600)
+        self.assertTrue(config['db']['CONN_HEALTH_CHECKS'])
+        self.assertIn('isolation_level', config['db']['OPTIONS'])
+        self.assertEqual(config['session'], 'django.contrib.sessions.backends.signed_cookies')
+        self.assertEqual(config['loaders'][0][0], 'django.template.loaders.cached.Loader')
+
+    def test_development_profile_is_default(self):
+        config = json.loads(self.load_settings().stdout)
+
+        self.assertTrue(config['debug'])
+        self.assertIn('debug_toolbar', config['apps'])
+
+    def test_production_requires_secret_key(self):
+        self.assertIn('ImproperlyConfigured', self.load_settings(DJANGO_ENV='production').stderr)
+
+
+class CityLocationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_city_spellings_share_one_location(self):
+        first = create_user(1, city='москва ')
+        second = create_user(2, city='Москва')
+
+        self.assertEqual(first.location_id, second.location_id)
+        self.assertEqual(first.city, 'Москва')
+        self.assertEqual(get_facets()['cities'].count('Москва'), 1)
+
+    def test_unknown_city_is_added_without_coordinates(self):
+        user = create_user(1, city='  Новый   Уренгой ')
+
+        self.assertEqual(user.location.name, 'Новый Уренгой')
+        self.assertIsNone(user.location.latitude)
+
+    def test_geohash_and_covering_cells(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        moscow = City.objects.get(normalized_name='москва')
+        cells = covering_cells(moscow.latitude, moscow.longitude, 50)
+
+        self.assertLessEqual(len(cells), 9)
+        self.assertTrue(any(moscow.geohash.startswith(cell) for cell in cells))
+
+    def test_home_radius_filter(self):
+        viewer = create_user(0, city='Москва')
+        create_user(1, city='Химки')
+        create_user(2, city='Тверь')
+        create_user(3, city='Москва')
+        self.client.force_login(viewer)
+
+        def cities(**params):
+            response = self.client.get(reverse('home'), {'age_min': 18, **params})
+            return sorted(user.city for user in response.context['users'].object_list)
+
+        self.assertEqual(cities(radius=50), ['Москва', 'Москва', 'Химки'])
+        self.assertEqual(cities(radius=300), ['Москва', 'Москва', 'Тверь', 'Химки'])
+        self.assertEqual(cities(city='Тверь', radius=10), ['Тверь'])
+        self.assertEqual(cities(city='тверь'), ['Тверь'])
+
+    def test_out_of_range_radius_is_ignored(self):
+        create_user(1, city='Москва')
+        create_user(2, city='Химки')
+
+        started = time.monotonic()
+        response = self.client.get(reverse('home'), {'city': 'Москва', 'radius': 10 ** 10})
+
+        self.assertEqual([user.city for user in response.context['users'].object_list], ['Москва'])
+        cells = covering_cells(55.75, 37.62, 10 ** 10)
+        self.assertLess(time.monotonic() - started, 5)
+        self.assertLessEqual(len(cells), 32)
+
+
+class FeedQueryPlanTest(TestCase):
+    """Запросы ленты на большом наборе данных идут по индексам, без полного просмотра таблицы"""
+    CASES = [
+        {},
+        {'gender_filter': 'F'},
+        {'age_min': '25', 'age_max': '27'},
+        {'gender_filter': 'M', 'age_min': '25', 'age_max': '35'},
+        {'status_filter': 'busy'},
+        {'city_filter': 'Казань'},
+        {'city_filter': 'Москва', 'radius_filter': '50'},
+        {'gender_filter': 'F', 'city_filter': 'Москва', 'status_filter': 'looking'},
+    ]
+
+    @classmethod
+    def setUpTestData(cls):
+        media_root = tempfile.mkdtemp()
+        with override_settings(MEDIA_ROOT=media_root):
+            call_command('seed_dating', users=5000, interactions=0, photos=0, seed=1, stdout=StringIO())
+        shutil.rmtree(media_root, ignore_errors=True)
+        User.objects.filter(pk__in=User.objects.order_by('pk').values('pk')[:500]).update(is_active=False)
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def assert_no_full_scan(self, queryset):
+        plan = queryset.explain()
+        if connection.vendor == 'postgresql':
+            self.assertNotIn('Seq Scan on dating_user', plan)
+        else:
+            # SCAN без USING INDEX - полный просмотр таблицы в SQLite
+            self.assertIsNone(re.search(r'SCAN dating_user\b(?! USING)', plan), plan)
+
+    def test_feed_queries_use_indexes(self):
+        params = dict.fromkeys(FILTER_PARAMS, '')
+        for case in self.CASES:
+            with self.subTest(**case):
+                queryset = filter_feed(AnonymousUser(), {**params, **case})
+                self.assert_no_full_scan(queryset[:11])
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_STICKY_SECONDS=10)
+class ReplicaRouterTest(TransactionTestCase):
+    """
+    Решения маршрутизатора внутри запроса: реплика 'replica' в тесте не создается.
+    TransactionTestCase - чтобы тест не выполнялся целиком внутри транзакции
+    """
+
+    def setUp(self):
+        self.user = create_user(1)
+        self.factory = RequestFactory()
+        self.session_store = SessionMiddleware(lambda request: None).SessionStore()
+        self.session_store.create()
+        self.router = ReplicaRouter()
+
+    def run_request(self, view, method='get'):
+        request = getattr(self.factory, method)('/')
+        request.session = self.session_store
+        result = {}
+
+        def get_response(request):
+            result.update(view() or {})
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(get_response)(request)
+        return result
+
+    def test_reads_go_to_replica_outside_writes(self):
+        result = self.run_request(lambda: {'db': self.router.db_for_read(User)})
+
+        self.assertEqual(result['db'], 'replica')
+        self.assertEqual(self.router.db_for_read(User), 'default')
+
+    def test_session_is_pinned_to_primary_after_write(self):
+        def write_then_read():
+            User.objects.filter(pk=self.user.pk).update(age=40)
+            return {'db': self.router.db_for_read(User)}
+
+        self.assertEqual(self.run_request(write_then_read)['db'], 'default')
+        self.assertEqual(self.run_request(lambda: {'db': self.router.db_for_read(User)})['db'], 'default')
+
+        with mock.patch('dating.routers.time.time', return_value=time.time() + 11):
+            self.assertEqual(self.run_request(lambda: {'db': self.router.db_for_read(User)})['db'], 'replica')
+
+    def test_unsafe_methods_and_transactions_read_from_primary(self):
+        read = lambda: {'db': self.router.db_for_read(User)}
+
+        self.assertEqual(self.run_request(read, method='post')['db'], 'default')
+
+        def read_in_transaction():
+            with transaction.atomic():
+                return read()
+
+        self.assertEqual(self.run_request(read)['db'], 'replica')
+        self.assertEqual(self.run_request(read_in_transaction)['db'], 'default')
+
+    def test_replicas_are_not_migrated(self):
+        self.assertFalse(self.router.allow_migrate('replica', 'dating'))
+        self.assertTrue(self.router.allow_migrate('default', 'dating'))
+
+
+class ViewPartitionsTest(TestCase):
+    def test_planned_partitions_cross_year(self):
+        now = datetime(2026, 11, 20, tzinfo=dt_timezone.utc)
+
+        plan = planned_partitions(now, ahead=2)
+
+        self.assertEqual([name for name, _, _ in plan], [
+            'dating_profileview_y2026m11', 'dating_profileview_y2026m12', 'dating_profileview_y2027m01',
+        ])
+        self.assertEqual(plan[1][2], datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_bounds('dating_profileview_y2027m01'), plan[2][1:])
+        self.assertIsNone(partition_bounds('dating_profileview_default'))
+
+    def test_retention_removes_old_views(self):
+        viewer, viewed = create_user(1), create_user(2)
+        ProfileView.objects.create(viewer=viewer, viewed=viewed, viewed_at=timezone.now() - timedelta(days=100))
+        recent = ProfileView.objects.create(viewer=viewer, viewed=viewed)
+
+        call_command('manage_view_partitions', retention_days=90, stdout=StringIO())
+
+        self.assertEqual(list(ProfileView.objects.values_list('pk', flat=True)), [recent.pk])
+
+    @skipUnless(connection.vendor == 'postgresql', 'Секции есть только в PostgreSQL')
+    def test_past_months_leave_default_partition(self):
+        viewer, viewed = create_user(1), create_user(2)
+        now = timezone.now()
+        ProfileView.objects.create(viewer=viewer, viewed=viewed, viewed_at=now - timedelta(days=200))
+        kept = ProfileView.objects.create(viewer=viewer, viewed=viewed, viewed_at=now - timedelta(days=40))
+        recent = ProfileView.objects.create(viewer=viewer, viewed=viewed)
+        # Отложенные проверки внешних ключей не дают выполнить ATTACH PARTITION
+        # в той же транзакции; команда же работает в своей
+        connection.check_constraints()
+
+        call_command('manage_view_partitions', retention_days=90, stdout=StringIO())
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {DEFAULT_PARTITION}')
+            self.assertEqual(cursor.fetchone(), (0,))
+        self.assertIn(partition_name(month_start(kept.viewed_at.year, kept.viewed_at.month)), existing_partitions())
+        self.assertEqual(sorted(ProfileView.objects.values_list('pk', flat=True)), [kept.pk, recent.pk])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Секционирование журнала просмотров есть только в PostgreSQL')
+class ProfileViewMigrationTest(TransactionTestCase):
+    """Миграция 0012 на настоящем PostgreSQL: секционированная таблица и перенос просмотров"""
+
+    before = [('dating', '0011_user_partial_indexes')]
+    after = [('dating', '0012_profile_view_log')]
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.migrate(targets)
+        return executor.loader.project_state(targets).apps
+
+    def tearDown(self):
+        executor = MigrationExecutor(connection)
+        self.migrate(executor.loader.graph.leaf_nodes())
+
+    def test_profile_view_table_is_partitioned(self):
+        old_apps = self.migrate(self.before)
+        OldUser = old_apps.get_model('dating', 'User')
+        viewer = OldUser.objects.create(username='viewer', email='viewer@example.com', gender='M', age=30)
+        viewed = OldUser.objects.create(username='viewed', email='viewed@example.com', gender='F', age=28)
+        old_apps.get_model('dating', 'UserInteraction').objects.create(
+            from_user=viewer, to_user=viewed, interaction_type='view'
+        )
+
+        new_apps = self.migrate(self.after)
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT partstrat FROM pg_partitioned_table WHERE partrelid = 'dating_profileview'::regclass"
+            )
+            self.assertEqual(cursor.fetchone(), ('r',))
+            cursor.execute('SELECT viewer_id, viewed_id FROM dating_profileview_default')
+            self.assertEqual(cursor.fetchall(), [(viewer.pk, viewed.pk)])
+            constraints = connection.introspection.get_constraints(cursor, 'dating_profileview')
+        self.assertIn('dating_profileview_viewed_idx', constraints)
+        self.assertIn('dating_profileview_viewer_idx', constraints)
+        self.assertEqual(
+            {tuple(c['foreign_key']) for c in constraints.values() if c['foreign_key']},
+            {('dating_user', 'id')}
+        )
+        self.assertFalse(new_apps.get_model('dating', 'UserInteraction').objects.exists())
+
+
+class ViewTrackingTest(TestCase):
+    def setUp(self):
+        view_buffer.drain()
+        self.viewer = create_user(1)
+        self.profile = create_user(2)
+        self.client.force_login(self.viewer)
+        self.url = reverse('user_detail', args=[self.profile.id])
+
+    def test_views_are_buffered_until_flush(self):
+        self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(reverse('user_detail', args=[self.viewer.id]))
+
+        self.assertFalse(ProfileView.objects.exists())
+
+        self.assertEqual(flush_views(), 2)
+        self.profile.refresh_from_db()
+        self.viewer.refresh_from_db()
+        # Два просмотра за минуту - одна строка журнала; свои просмотры не учитываются
+        self.assertEqual(ProfileView.objects.count(), 1)
+        self.assertEqual((self.profile.views_count, self.viewer.views_count), (2, 0))
+        self.assertEqual(
+            list(ProfileViewer.objects.values_list('viewed_id', 'viewer_id')),
+            [(self.profile.id, self.viewer.id)]
+        )
+
+    def test_flush_when_buffer_is_full(self):
+        other = create_user(3)
+
+        with override_settings(PROFILE_VIEW_BUFFER_SIZE=2):
+            self.client.get(self.url)
+            self.assertFalse(ProfileView.objects.exists())
+            self.client.get(reverse('user_detail', args=[other.id]))
+
+        self.assertEqual(ProfileView.objects.count(), 2)
+        self.assertEqual(flush_views(), 0)
+
+    def test_repeated_flush_skips_logged_minute_but_counts_views(self):
+        self.client.get(self.url)
+        flush_views()
+        self.client.get(self.url)
+        flush_views()
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.views_count, 2)
+        self.assertLessEqual(ProfileView.objects.count(), 2)
+        self.assertEqual(ProfileViewer.objects.count(), 1)
+
+    def test_idle_buffer_is_written_when_due(self):
+        self.client.get(self.url)
+
+        self.assertEqual(flush_if_due(), 0)
+        # Новых просмотров нет, но буфер устарел - его пишет фоновая проверка
+        with override_settings(PROFILE_VIEW_FLUSH_SECONDS=0):
+            self.assertEqual(flush_if_due(), 1)
+
+        self.assertEqual(ProfileView.objects.count(), 1)
+
+    def test_buffer_is_written_on_exit_only_to_same_database(self):
+        self.client.get(self.url)
+
+        self.assertEqual(flush_on_exit('other-database'), 0)
+        self.assertEqual(flush_on_exit(connection.settings_dict['NAME']), 1)
+        self.assertEqual(ProfileView.objects.count(), 1)
+
+    def test_views_of_deleted_users_are_dropped(self):
+        self.client.get(self.url)
+        self.profile.delete()
+
+        self.assertEqual(flush_views(), 0)
+        self.assertFalse(ProfileView.objects.exists())
+
+    def test_profile_page_lists_viewers(self):
+        self.client.get(self.url)
+        flush_views()
+        self.client.force_login(self.profile)
+
+        response = self.client.get(reverse('profile'))
+
+        self.assertEqual([item.viewer for item in response.context['viewers']], [self.viewer])
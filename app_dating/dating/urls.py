@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, api
 from django.contrib.auth import views as auth_views
 
 urlpatterns = [
@@ -23,4 +23,12 @@ urlpatterns = [
     path('profile/photo/upload/', views.upload_photo, name='upload_photo'),
     path('profile/photo/<int:photo_id>/delete/', views.delete_photo, name='delete_photo'),
     path('profile/photo/<int:photo_id>/set-main/', views.set_main_photo, name='set_main_photo'),
+
+    # JSON API для мобильного клиента
+    path('api/feed/', api.feed, name='api_feed'),
+    path('api/interactions/', api.interactions, name='api_interactions'),
+    path('api/notifications/', api.notifications, name='api_notifications'),
+
+    # Метрики для Prometheus
+    path('metrics', views.metrics, name='metrics'),
 ]
\ No newline at end of file
@@ -0,0 +1,220 @@
+"""
+Учет просмотров анкет без записи в БД на каждый просмотр.
+
+Просмотры копятся в памяти процесса и записываются пачкой, когда буфер
+наполнится (PROFILE_VIEW_BUFFER_SIZE) или самому старому просмотру в нем
+исполнится PROFILE_VIEW_FLUSH_SECONDS. Возраст буфера проверяет фоновый
+поток, поэтому просмотры записываются и тогда, когда новых нет; при
+штатном завершении процесса остаток буфера дописывается. Вместе с журналом
+ProfileView обновляются агрегаты: User.views_count и ProfileViewer
+("кто смотрел"). При аварийном завершении теряются только просмотры из буфера.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# noinspection PyUnresolvedReferences
+from asgiref.sync import sync_to_async
+# noinspection PyUnresolvedReferences
+from django.conf import settings
+# noinspection PyUnresolvedReferences
+from django.db import connection, transaction
+# noinspection PyUnresolvedReferences
+from django.db.models import F
+# noinspection PyUnresolvedReferences
+from django.utils import timezone
+from .models import ProfileView, ProfileViewer, User
+from .routers import current_routing
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# Как часто фоновый поток проверяет возраст буфера, секунды
+FLUSH_CHECK_SECONDS = 1
+
+
+class ViewBuffer:
+    """Потокобезопасный буфер: (зритель, анкета, минута) -> число просмотров"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._events = Counter()
+        self._oldest = None
+
+    def add(self, viewer_id, viewed_id, viewed_at):
+        """Добавляет просмотр; True, если буфер пора записать"""
+        key = (viewer_id, viewed_id, viewed_at.replace(second=0, microsecond=0))
+        with self._lock:
+            if self._oldest is None:
+                self._oldest = time.monotonic()
+            self._events[key] += 1
+            return self._due()
+
+    def is_due(self):
+        with self._lock:
+            return self._due()
+
+    def _due(self):
+        if self._oldest is None:
+            return False
+        return (
+            len(self._events) >= getattr(settings, 'PROFILE_VIEW_BUFFER_SIZE', 500)
+            or time.monotonic() - self._oldest >= getattr(settings, 'PROFILE_VIEW_FLUSH_SECONDS', 30)
+        )
+
+    def drain(self):
+        """Забирает накопленные просмотры и очищает буфер"""
+        with self._lock:
+            events, self._events = self._events, Counter()
+            self._oldest = None
+        return events
+
+
+buffer = ViewBuffer()
+# Выключается на время замеров (см. dating.benchmarks): просмотры из буфера
+# пишет отдельный поток, вне транзакции замера с откатом
+tracking_enabled = ContextVar('dating_view_tracking', default=True)
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def start_flusher():
+    """
+    Запускает фоновую запись буфера (один поток на процесс) и дозапись
+    остатка при завершении процесса. Вызывается при первом просмотре.
+    """
+    global _flusher
+    with _flusher_lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_flush_periodically, name='profile-view-flusher', daemon=True)
+        _flusher.start()
+        atexit.register(flush_on_exit, connection.settings_dict['NAME'])
+
+
+def _flush_periodically():
+    while True:
+        time.sleep(FLUSH_CHECK_SECONDS)
+        try:
+            flush_if_due()
+        except Exception:
+            logger.exception('Не удалось записать просмотры анкет')
+        finally:
+            # У потока свое соединение с БД; не держим его между проверками
+            connection.close()
+
+
+def flush_if_due():
+    """Записывает буфер, если он наполнился или устарел, даже без новых просмотров"""
+    return flush_views() if buffer.is_due() else 0
+
+
+def flush_on_exit(database_name):
+    # Просмотры относятся к БД, с которой работал процесс. В тестах к выходу
+    # тестовая БД уже удалена, а в настройках снова имя рабочей - не пишем туда
+    if connection.settings_dict['NAME'] != database_name:
+        return 0
+    try:
+        return flush_views()
+    except Exception:
+        logger.exception('Не удалось записать просмотры анкет при завершении')
+        return 0
+
+
+@contextmanager
+def suspend_tracking():
+    token = tracking_enabled.set(False)
+    try:
+        yield
+    finally:
+        tracking_enabled.reset(token)
+
+
+def record_view(viewer_id, viewed_id):
+    if viewer_id == viewed_id or not tracking_enabled.get():
+        return
+    if _flusher is None:
+        start_flusher()
+    if buffer.add(viewer_id, viewed_id, timezone.now()):
+        flush_views()
+
+
+async def arecord_view(viewer_id, viewed_id):
+    if viewer_id == viewed_id or not tracking_enabled.get():
+        return
+    if _flusher is None:
+        start_flusher()
+    if buffer.add(viewer_id, viewed_id, timezone.now()):
+        await sync_to_async(flush_views)()
+
+
+def flush_views():
+    """Записывает буфер в БД; возвращает число учтенных просмотров"""
+    events = buffer.drain()
+    if not events:
+        return 0
+    # Запись чужих просмотров не должна "прилеплять" сессию текущего зрителя
+    # к основной БД (см. dating.routers)
+    token = current_routing.set(None)
+    try:
+        return write_views(events)
+    finally:
+        current_routing.reset(token)
+
+
+def write_views(events):
+    # Пользователь мог быть удален, пока его просмотры лежали в буфере
+    user_ids = {pk for viewer_id, viewed_id, _ in events for pk in (viewer_id, viewed_id)}
+    existing = set(User.objects.filter(pk__in=user_ids).values_list('pk', flat=True))
+    events = {
+        key: count for key, count in events.items()
+        if key[0] in existing and key[1] in existing
+    }
+    if not events:
+        return 0
+
+    last_viewed = {}
+    views_per_profile = Counter()
+    for (viewer_id, viewed_id, minute), count in events.items():
+        pair = (viewed_id, viewer_id)
+        last_viewed[pair] = max(minute, last_viewed.get(pair, minute))
+        views_per_profile[viewed_id] += count
+
+    # Анкеты с одинаковым приростом обновляются одним UPDATE
+    by_increment = defaultdict(list)
+    for viewed_id, count in views_per_profile.items():
+        by_increment[count].append(viewed_id)
+
+    with transaction.atomic():
+        # Строка за эту минуту могла уже прийти из буфера другого процесса
+        ProfileView.objects.bulk_create(
+            [
+                ProfileView(viewer_id=viewer_id, viewed_id=viewed_id, viewed_at=minute)
+                for viewer_id, viewed_id, minute in events
+            ],
+            batch_size=BATCH_SIZE,
+            ignore_conflicts=True
+        )
+        ProfileViewer.objects.bulk_create(
+            [
+                ProfileViewer(viewed_id=viewed_id, viewer_id=viewer_id, last_viewed_at=viewed_at)
+                for (viewed_id, viewer_id), viewed_at in last_viewed.items()
+            ],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['viewed', 'viewer'],
+            update_fields=['last_viewed_at']
+        )
+        for increment, ids in by_increment.items():
+            User.objects.filter(pk__in=sorted(ids)).update(views_count=F('views_count') + increment)
+
+    return sum(events.values())
+
+
+def recent_viewers(user, limit=20):
+    """Последние зрители анкеты - из агрегата, без чтения журнала"""
+    return ProfileViewer.objects.filter(viewed=user).select_related('viewer').order_by('-last_viewed_at')[:limit]
@@ -1,108 +1,207 @@
+import asyncio
+
+# noinspection PyUnresolvedReferences
+from asgiref.sync import sync_to_async
 # noinspection PyUnresolvedReferences
-from django.shortcuts import render, get_object_or_404, redirect
+from django.shortcuts import render, get_object_or_404, aget_object_or_404, redirect
 # noinspection PyUnresolvedReferences
 from django.contrib.auth.decorators import login_required
 # noinspection PyUnresolvedReferences
 from django.contrib import messages
 # noinspection PyUnresolvedReferences
-from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from django.core.cache import cache
+# noinspection PyUnresolvedReferences
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+# noinspection PyUnresolvedReferences
+from django.conf import settings
 # noinspection PyUnresolvedReferences
-from django.db.models import Q
+from django.views.decorators.http import require_GET
+# noinspection PyUnresolvedReferences
+from django.template.loader import render_to_string
+# noinspection PyUnresolvedReferences
+from django.utils.safestring import mark_safe
 # noinspection PyUnresolvedReferences
 from django.contrib.auth import login
-from .models import User, UserPhoto, UserInteraction
+from .models import City, User, UserPhoto
 from .forms import CustomUserCreationForm, UserEditForm, PhotoUploadForm
-
-def home(request):
-    """Главная страница с поиском и фильтрацией"""
-    # Получаем всех активных пользователей
-    users_list = User.objects.filter(is_active=True).order_by('-created_at')
-
-    # Параметры поиска из GET-запроса
-    search_query = request.GET.get('search', '')
-    gender_filter = request.GET.get('gender', '')
-    city_filter = request.GET.get('city', '')
-    age_min = request.GET.get('age_min', '')
-    age_max = request.GET.get('age_max', '')
-    status_filter = request.GET.get('status', '')
+from .facets import aget_facets
+from .geo import nearby_city_ids, normalize_city_name
+from .interactions import record_swipe
+from .metrics import record_cache, render_metrics
+from .pagination import CursorPage, numbered_page
+from .profile_cache import PROFILE_CACHE_TIMEOUT, aget_profile_version, html_key, touch_profile
+from .queues import candidate_ids
+from .search import search_users
+from .seen import get_seen_filter
+from .view_tracking import arecord_view, recent_viewers
+
+# Сколько лучших рекомендаций доступно для листания на главной
+RECOMMENDATIONS_LIMIT = 200
+
+# Радиусы поиска рядом, км
+RADIUS_CHOICES = [10, 25, 50, 100, 300]
+
+# Параметры фильтров главной страницы: имя в контексте -> GET-параметр
+FILTER_PARAMS = {
+    'search_query': 'search',
+    'gender_filter': 'gender',
+    'city_filter': 'city',
+    'radius_filter': 'radius',
+    'age_min': 'age_min',
+    'age_max': 'age_max',
+    'status_filter': 'status',
+}
+
+
+async def alist(queryset):
+    """Асинхронно загружает queryset в список"""
+    return [obj async for obj in queryset]
+
+
+def filter_feed(viewer, params):
+    """
+    Активные пользователи с фильтрами главной страницы. Сочетания фильтров
+    покрыты частичными индексами WHERE is_active (см. User.Meta.indexes)
+    """
+    # Главное фото приходит в том же запросе через User.main_photo
+    users_list = User.objects.filter(is_active=True).order_by('-created_at', '-id').select_related('main_photo')
 
     # Применяем фильтры
-    if search_query:
-        users_list = users_list.filter(
-            Q(first_name__icontains=search_query) |
-            Q(last_name__icontains=search_query) |
-            Q(city__icontains=search_query) |
-            Q(hobbies__icontains=search_query)
-        )
-
-    if gender_filter:
-        users_list = users_list.filter(gender=gender_filter)
-
-    if city_filter:
-        users_list = users_list.filter(city__icontains=city_filter)
-
-    if age_min:
-        users_list = users_list.filter(age__gte=age_min)
-
-    if age_max:
-        users_list = users_list.filter(age__lte=age_max)
-
-    if status_filter:
-        users_list = users_list.filter(status=status_filter)
+    if params['search_query']:
+        users_list = search_users(users_list, params['search_query'])
+
+    if params['gender_filter']:
+        users_list = users_list.filter(gender=params['gender_filter'])
+
+    # Поиск рядом: центр - выбранный город, а без него - город зрителя.
+    # Допустимы только радиусы из списка: время поиска растет с радиусом
+    radius = int(params['radius_filter']) if params['radius_filter'].isdigit() else None
+    if radius not in RADIUS_CHOICES:
+        radius = None
+    center = None
+    if radius and params['city_filter']:
+        center = City.objects.filter(normalized_name=normalize_city_name(params['city_filter'])).first()
+    elif radius and viewer.is_authenticated:
+        center = viewer.location
+
+    if center is not None:
+        users_list = users_list.filter(location_id__in=nearby_city_ids(center, radius))
+    elif params['city_filter']:
+        users_list = users_list.filter(location__normalized_name=normalize_city_name(params['city_filter']))
+
+    if params['age_min']:
+        users_list = users_list.filter(age__gte=params['age_min'])
+
+    if params['age_max']:
+        users_list = users_list.filter(age__lte=params['age_max'])
+
+    if params['status_filter']:
+        users_list = users_list.filter(status=params['status_filter'])
+
+    return users_list
+
+
+def select_feed_page(viewer, params):
+    """Страница ленты по параметрам поиска (синхронная часть главной страницы)"""
+    users_list = filter_feed(viewer, params)
+    filters_applied = any(params[key] for key in FILTER_PARAMS)
+
+    if viewer.is_authenticated and not filters_applied:
+        # Рекомендации, ранжированные по совместимости со зрителем
+        ranked_ids = candidate_ids(viewer, limit=RECOMMENDATIONS_LIMIT)
+        users = numbered_page(ranked_ids, params['page'])
+        page_users = users_list.in_bulk(users.object_list)
+        users.object_list = [page_users[pk] for pk in users.object_list if pk in page_users]
+    elif params['search_query']:
+        # Результаты поиска отсортированы по релевантности - обычная пагинация по номерам
+        users = numbered_page(users_list, params['page'])
+    else:
+        # Лента - keyset-пагинация по (created_at, id) без COUNT(*) и OFFSET
+        # Вошедшему пользователю не показываем анкеты, которые он уже оценил
+        exclude = get_seen_filter(viewer.pk).contains if viewer.is_authenticated else None
+        users = CursorPage(users_list, params['cursor'], per_page=10, exclude=exclude)
 
-    # Пагинация - 10 пользователей на страницу
-    paginator = Paginator(users_list, 10)
-    page = request.GET.get('page')
+    return users
 
-    try:
-        users = paginator.page(page)
-    except PageNotAnInteger:
-        users = paginator.page(1)
-    except EmptyPage:
-        users = paginator.page(paginator.num_pages)
 
-    # Получаем главные фото для каждого пользователя
-    for user in users:
-        user.main_photo = UserPhoto.objects.filter(
-            user=user,
-            is_main=True
-        ).first()
+async def home(request):
+    """Главная страница с поиском и фильтрацией"""
+    viewer = await request.auser()
 
-    # Уникальные города для фильтра
-    cities = User.objects.filter(is_active=True).values_list(
-        'city', flat=True
-    ).distinct().order_by('city')
+    # Параметры поиска из GET-запроса
+    params = {key: request.GET.get(name, '') for key, name in FILTER_PARAMS.items()}
+    params['page'] = request.GET.get('page')
+    params['cursor'] = request.GET.get('cursor')
+
+    # Лента и фильтры (города и счетчики из кэша) загружаются параллельно
+    users, facets = await asyncio.gather(
+        sync_to_async(select_feed_page)(viewer, params),
+        aget_facets(),
+    )
 
     context = {
+        'user': viewer,
         'users': users,
-        'search_query': search_query,
-        'gender_filter': gender_filter,
-        'city_filter': city_filter,
-        'age_min': age_min,
-        'age_max': age_max,
-        'status_filter': status_filter,
-        'cities': cities,
-        'genders': User.GENDER_CHOICES,
-        'statuses': User.STATUS_CHOICES,
+        'cursor_pagination': isinstance(users, CursorPage),
+        'search_query': params['search_query'],
+        'gender_filter': params['gender_filter'],
+        'city_filter': params['city_filter'],
+        'radius_filter': params['radius_filter'],
+        'radius_choices': RADIUS_CHOICES,
+        'age_min': params['age_min'],
+        'age_max': params['age_max'],
+        'status_filter': params['status_filter'],
+        'cities': facets['cities'],
+        'genders': [
+            (value, label, facets['genders'].get(value, 0))
+            for value, label in User.GENDER_CHOICES
+        ],
+        'statuses': [
+            (value, label, facets['statuses'].get(value, 0))
+            for value, label in User.STATUS_CHOICES
+        ],
     }
 
-    return render(request, 'dating/home.html', context)
+    # Шаблон может обращаться к БД, поэтому рендерим его в потоке
+    return await sync_to_async(render)(request, 'dating/home.html', context)
 
 
 @login_required
-def user_detail(request, user_id):
+async def user_detail(request, user_id):
     """Детальная страница пользователя"""
-    user = get_object_or_404(User, id=user_id, is_active=True)
-    photos = UserPhoto.objects.filter(user=user)
-    main_photo = photos.filter(is_main=True).first()
+    viewer = await request.auser()
+
+    # Карточка профиля кэшируется по версии (updated_at и время последнего фото),
+    # поэтому при попадании в кэш к БД не обращаемся
+    version = await aget_profile_version(user_id)
+    if version is None:
+        raise Http404('Пользователь не найден')
+
+    profile_html = await cache.aget(html_key(user_id, version))
+    record_cache('profile_html', profile_html is not None)
+    if profile_html is None:
+        # Профиль и фото не зависят друг от друга - запрашиваем одновременно
+        user, photos = await asyncio.gather(
+            aget_object_or_404(User, id=user_id, is_active=True),
+            alist(UserPhoto.objects.filter(user_id=user_id)),
+        )
+        main_photo = next((photo for photo in photos if photo.is_main), None)
+        profile_html = await sync_to_async(render_to_string)('dating/user_detail_card.html', {
+            'profile_user': user,
+            'photos': photos,
+            'main_photo': main_photo,
+        })
+        await cache.aset(html_key(user_id, version), profile_html, PROFILE_CACHE_TIMEOUT)
+
+    # Просмотр попадает в буфер; в БД пишется пачкой вместе с другими
+    await arecord_view(viewer.pk, user_id)
 
     context = {
-        'profile_user': user,
-        'photos': photos,
-        'main_photo': main_photo,
+        'user': viewer,
+        'profile_html': mark_safe(profile_html),
     }
 
-    return render(request, 'dating/user_detail.html', context)
+    return await sync_to_async(render)(request, 'dating/user_detail.html', context)
 
 def register(request):
     if request.method == 'POST':
@@ -132,11 +231,14 @@ def profile_edit(request):
 
 
 @login_required
-def interact_user(request, user_id, action):
+async def interact_user(request, user_id, action):
     """Универсальная функция для лайка/дизлайка"""
-    target_user = get_object_or_404(User, id=user_id)
+    target_user, viewer = await asyncio.gather(
+        aget_object_or_404(User, id=user_id),
+        request.auser(),
+    )
 
-    if target_user == request.user:
+    if target_user == viewer:
         messages.error(request, "Нельзя взаимодействовать с собой!")
         return redirect('home')
 
@@ -151,17 +253,19 @@ def interact_user(request, user_id, action):
         messages.error(request, "Неизвестное действие")
         return redirect('user_detail', user_id=user_id)
 
-    # Создаем или обновляем взаимодействие
-    interaction, created = UserInteraction.objects.update_or_create(
-        from_user=request.user,
-        to_user=target_user,
-        defaults={'interaction_type': interaction_type}
+    # Создаем или обновляем взаимодействие вместе со счетчиком лайков.
+    # Транзакции в async ORM недоступны, поэтому запись идет в потоке
+    interaction, previous_type, match = await sync_to_async(record_swipe)(
+        viewer, target_user, interaction_type
     )
 
-    if created:
-        messages.success(request, message)
-    else:
+    if previous_type == interaction_type:
         messages.info(request, f"Вы уже {message.lower()}")
+    else:
+        messages.success(request, message)
+
+    if match:
+        messages.success(request, f"У вас взаимная симпатия с {target_user.first_name}!")
 
     return redirect('user_detail', user_id=user_id)
 
@@ -172,7 +276,8 @@ def profile(request):
     return render(request, 'dating/profile.html', {
         'user': request.user,
         'photos': photos,
-        'photo_form': PhotoUploadForm()  # Форма для загрузки новых фото
+        'photo_form': PhotoUploadForm(),  # Форма для загрузки новых фото
+        'viewers': recent_viewers(request.user),
     })
 
 @login_required
@@ -183,6 +288,7 @@ def upload_photo(request):
         if form.is_valid():
             photo = form.save(commit=False)
             photo.user = request.user
+            # Оригинал сохраняется сразу, копии создаст воркер process_photos
             photo.save()
             messages.success(request, 'Фото успешно загружено!')
             return redirect('profile')
@@ -201,8 +307,16 @@ def delete_photo(request, photo_id):
 @login_required
 def set_main_photo(request, photo_id):
     """Установка фото как главного"""
-    photo = get_object_or_404(UserPhoto, id=photo_id, user=request.user)
-    photo.is_main = True
-    photo.save()
+    if not UserPhoto.set_main(request.user.pk, photo_id):
+        raise Http404('Фото не найдено')
+    touch_profile(request.user.pk)
     messages.success(request, 'Фото установлено как главное')
     return redirect('profile')
+
+@require_GET
+def metrics(request):
+    """Метрики процесса в текстовом формате Prometheus"""
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', None)
+    if allowed_ips and request.META.get('REMOTE_ADDR') not in allowed_ips:
+        return HttpResponseForbidden()
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')